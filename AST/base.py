@@ -1,37 +1,54 @@
-from typing import Dict, Iterable, Optional, Callable, List, Type, Union
+from typing import Dict, Iterable, Optional, Callable, List, Set, Tuple, Type, Union
 from abc import ABC, abstractmethod
 from inspect import getfullargspec
 from functools import wraps
+from weakref import WeakSet
 
 forward_declarations = {}
 class_class_created = False
 
 LocalsType = Dict[str, Union[Type["Object"], Type["IComputable"], str]]
 
+shared_objects: Set[int] = set()  # Ids of the interned null, bools and small ints
+
+
+class Object:
+    __slots__ = ("type", "attributes")
 
-class Object(Exception):
     def __init__(self, type: "Class") -> None:
         self.type = type
-        self.attributes = {}
-        self.is_return = False
+        self.attributes: Optional[Dict[str, Type["Object"]]] = None  # Most objects never get one
 
     def call(self, name: str, *args: List[Type["Object"]]) -> Type["Object"]:
-        return MemberCall(Constant(self), name, [Constant(arg) for arg in args]).eval(())
+        return call_member(self, get_member(self, name), list(args), None)
 
     def get(self, index, *, use_parent=False):
-        return self.attributes.get(index, (self.type.get_method(index)
-                                           if not use_parent
-                                           else self.type.parent.get_method(index)))
+        if self.attributes is not None and index in self.attributes:
+            return self.attributes[index]
+        return (self.type.get_method(index)
+                if not use_parent
+                else self.type.parent.get_method(index))
 
     def set(self, index, value):
+        if self.attributes is None:
+            if id(self) in shared_objects:  # Every equal value is this same object, an attribute would leak into all
+                raise AttributeError(f"Can't set {index} on shared {self.type.name} values")
+            self.attributes = {}
         self.attributes[index] = value
 
     def has(self, index):
-        return index in self.attributes or self.type.has_method(index)
+        return (self.attributes is not None and index in self.attributes) or self.type.has_method(index)
 
     def __hash__(self):
         return self.call("#hash").value
 
+    def __eq__(self, other):  # Dict keys of user classes meet through #equal, builtin values override both
+        if self is other:
+            return True
+        if not isinstance(other, Object) or not self.has("#equal"):
+            return NotImplemented
+        return bool(call_operator("#equal", [self, other]))
+
     def __repr__(self):
         if self.has("#to_string"):
             return self.call("#to_string").value
@@ -39,28 +56,36 @@ class Object(Exception):
             return f"instance of {self.type.name}"
 
     def __iter__(self):
-        return self.call("#iter")
+        result = self.call("#iter")
+        if type(result).__iter__ is not Object.__iter__:  # A builtin collection, it iterates natively and has no #next
+            return iter(result)
+        return result
 
     def __next__(self):
         try:
             result = self.call("#next")
-        except Exception as e:
-            if isinstance(e, Object) and e.type.name == "StopIteration":
+        except ObjectException as e:
+            if e.value.type.name == "StopIteration":
                 raise StopIteration
-            else:
-                raise e
+            raise
         return result
 
 
+class ObjectException(Exception):  # Carries a raised fcad object, objects themselves aren't exceptions
+    def __init__(self, value: Object) -> None:
+        super().__init__(value)
+        self.value = value
+
+
 class IComputable(ABC):
     @abstractmethod
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: "Scope") -> Type[Object]:
         pass
 
 
 class IAssignable(ABC):
     @abstractmethod
-    def set_value(self, scope_path: tuple, value: Type[Object]) -> None:
+    def set_value(self, scope: "Scope", value: Type[Object]) -> None:
         pass
 
 
@@ -68,81 +93,133 @@ class Call(IComputable):
     @staticmethod
     def do_call(function: "Function",
                 new_locals: Dict[str, Object]):
-        with CreateScope(function.parent_scope, new_locals) as new_scope:
-            result = function.operation.eval(new_scope)
-            result.is_return = False
-            result.is_yield = False
-            return result
+        scope = Scope(function.layout, function.parent_scope)
+        scope.fill(new_locals)
+        return Call.run(function, scope)
+
+    @staticmethod
+    def run(function: "Function", scope: "Scope"):
+        if function.cell_slots or function.cells:
+            scope.bind_cells(function.cell_slots, function.cells)
+        result = function.operation.eval(scope)
+        if result is RETURN:
+            return scope.return_value
+        if result is None or type(result) is Completion:  # Fell off the end of the body
+            return create_none()
+        return result
 
 
 class Constant(IComputable):
     def __init__(self, value: Type[Object]) -> None:
         self.value = value
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: "Scope") -> Type[Object]:
         return self.value
 
 
-class Scope:
-    scope_n = 0
+GLOBAL_DEPTH = -1
 
-    def __init__(self,
-                 elements: LocalsType = {}):
-        self.elements = dict(elements)
-
-    def __getitem__(self, path: tuple) -> Type[Object]:
-        if len(path) > 1:
-            return self.elements[path[0]][path[1:]] or self.elements.get(path[-1], None)
-        result = self.elements.get(path[0], None)
-        if type(result) is str and result == "global":
-            return Variable.table[path]
-        else:
-            return result
 
-    def __setitem__(self, path: tuple, value: Type[Object]) -> None:
-        if len(path) > 1:
-            self.elements[path[0]][path[1:]] = value
-        else:
-            result = self.elements.get(path[0], None)
-            if type(result) is str and result == "global":
-                Variable.table[path] = value
-            else:
-                self.elements[path[0]] = value
+class Completion:  # What a statement hands back instead of a value when it ends abruptly
+    def __init__(self, name: str) -> None:
+        self.name = name
 
-    def __delitem__(self, path: tuple) -> None:
-        if len(path) > 1:
-            del self.elements[path[0]][path[1:]]
-        else:
-            del self.elements[path[0]]
+    def __repr__(self) -> str:
+        return f"<{self.name}>"
 
-    def names(self):
-        return list(self.elements.keys())
 
-    def new_scope(self,
-                  path: tuple,
-                  elements: LocalsType) -> tuple:
-        if len(path) > 0:
-            return (path[0],) + self.elements[path[0]].new_scope(path[1:], elements)
-        else:
-            result = Scope.scope_n
-            Scope.scope_n += 1
-            self.elements[result] = Scope(elements)
-            return (result,)
+RETURN = Completion("return")  # The value is left in the frame's return_value
+BREAK = Completion("break")
+CONTINUE = Completion("continue")
+
+
+class Cell:  # A captured local, shared by the frame that owns it and the closures reading it
+    __slots__ = ("value",)
+
+    def __init__(self, value: Optional[Type[Object]] = None) -> None:
+        self.value = value
 
 
-class CreateScope:
-    def __init__(self, path: tuple, elements: LocalsType, *, persistent=True) -> None:
-        self.path = path
-        self.elements = elements
-        self.persistent = persistent
+def outer_name(name: str) -> str:  # Layout key of the cell for the enclosing variable a local shadows
+    return "^" + name
 
-    def __enter__(self):
-        self.new_path = Variable.table.new_scope(self.path, self.elements)
-        return self.new_path
 
-    def __exit__(self, type, value, traceback):
-        if not self.persistent:
-            del Variable.table[self.new_path]
+class Scope:  # One call frame, resolved names live in slots and the rest in elements
+    def __init__(self,
+                 layout: Dict[str, int] = {},
+                 parent: Optional["Scope"] = None) -> None:
+        self.layout = layout
+        self.slots = [None] * len(layout)
+        self.parent = parent
+        self.elements = {}
+        self.global_names = None
+        self.return_value: Optional[Type[Object]] = None
+
+    def fill(self, elements: LocalsType) -> None:
+        for name, value in elements.items():
+            index = self.layout.get(name)
+            if index is not None:
+                self.slots[index] = value
+            else:
+                self.elements[name] = value
+
+    def bind_cells(self, cell_slots: Iterable[int], cells: Iterable[Cell]) -> None:
+        slots = self.slots
+        for index in cell_slots:
+            slots[index] = Cell(slots[index])
+        if cells:  # Free variables take the last slots of the layout
+            slots[len(slots) - len(cells):] = cells
+
+    def lookup(self, name: str) -> Optional[Type[Object]]:
+        scope = self
+        while scope is not None:
+            if scope.global_names is not None and name in scope.global_names:
+                return Variable.table.elements.get(name)
+            index = scope.layout.get(name)
+            if index is not None:
+                result = scope.slots[index]
+                if type(result) is Cell:
+                    result = result.value
+                if result is not None:
+                    return result
+            result = scope.elements.get(name)
+            if result is not None:
+                return result
+            scope = scope.parent
+        return Variable.table.elements.get(name)  # Functions that can't read their creator keep no parent
+
+    def load(self, depth: int, index: int, name: str) -> Optional[Type[Object]]:
+        scope = self
+        for _ in range(depth):
+            scope = scope.parent
+        result = scope.slots[index]
+        if type(result) is Cell:
+            result = result.value
+        if result is None:  # Not assigned yet, so an outer name shows through
+            outer = scope.layout.get(outer_name(name))
+            if outer is not None:  # Closures keep no parent, they captured the enclosing variable instead
+                result = scope.slots[outer].value
+                if result is not None:
+                    return result
+            return (scope.parent or Variable.table).lookup(name)
+        return result
+
+    def assign(self, name: str, value: Type[Object]) -> None:
+        if self.global_names is not None and name in self.global_names:
+            Variable.table.elements[name] = value
+            return
+        index = self.layout.get(name)
+        if index is None:
+            self.elements[name] = value
+        elif type(self.slots[index]) is Cell:
+            self.slots[index].value = value
+        else:
+            self.slots[index] = value
+
+    def declare_global(self, name: str) -> None:
+        if self.global_names is None:
+            self.global_names = set()
+        self.global_names.add(name)
 
 
 class Variable(IComputable, IAssignable):
@@ -150,15 +227,33 @@ class Variable(IComputable, IAssignable):
 
     def __init__(self, name: str) -> None:
         self.name = name
-
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        result = Variable.table[scope_path + (self.name,)]
+        self.depth: Optional[int] = None  # Set by the resolver, None looks the name up at run time
+        self.index: Optional[int] = None
+        self.is_cell = False  # The slot holds a Cell shared with closures
+
+    def eval(self, scope: Scope) -> Type[Object]:
+        if self.depth is None:
+            result = scope.lookup(self.name)
+        elif self.depth == GLOBAL_DEPTH:
+            result = Variable.table.elements.get(self.name)
+        else:
+            result = scope.load(self.depth, self.index, self.name)
         if result is not None:
             return result
         raise IndexError(f"Name {self.name} could not be resolved")
 
-    def set_value(self, scope_path: tuple, value: Object):
-        Variable.table[scope_path + (self.name,)] = value
+    def set_value(self, scope: Scope, value: Object):
+        if self.depth is None:
+            scope.assign(self.name, value)
+        elif self.depth == GLOBAL_DEPTH:
+            Variable.table.elements[self.name] = value
+        else:
+            for _ in range(self.depth):
+                scope = scope.parent
+            if type(scope.slots[self.index]) is Cell:
+                scope.slots[self.index].value = value
+            else:
+                scope.slots[self.index] = value
 
 
 class Assignment(IComputable):
@@ -166,9 +261,9 @@ class Assignment(IComputable):
         self.object = object
         self.value = value
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        value = self.value.eval(scope_path)
-        self.object.set_value(scope_path, value)
+    def eval(self, scope: Scope) -> Type[Object]:
+        value = self.value.eval(scope)
+        self.object.set_value(scope, value)
         return value
 
 
@@ -176,23 +271,26 @@ class GlobalDeclare(IComputable):
     def __init__(self, name):
         self.name = name
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        Variable(self.name).set_value(scope_path, "global")
+    def eval(self, scope: Scope) -> Type[Object]:
+        if scope is not Variable.table:
+            scope.declare_global(self.name)
         return create_none()
 
 
 class IPrimitiveType(Object):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
 
 class PrimitiveCall(IComputable):
     def __init__(self,
-                 function: Callable[[tuple], Type[Object]]) -> None:
+                 function: Callable[["Scope"], Type[Object]]) -> None:
         self.function = function
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        value = self.function(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        value = self.function(scope)
         if value is None:
             return create_none()
         else:
@@ -207,52 +305,89 @@ def to_primitive_function(func: Callable) -> "Function":
     has_kw_arg = specs[2] is not None
 
     @wraps(func)
-    def primitive_func(scope_path: tuple):
+    def primitive_func(scope: Scope):
         if has_kw_arg:
-            kwargs = {key.value: value for key, value in Variable("#kwargs").eval(scope_path).elements.items()}
+            kwargs = {key.value: value for key, value in Variable("#kwargs").eval(scope).elements.items()}
             if var_arg_name is None:
-                return func(*[Variable(name).eval(scope_path) for name in arg_names], **kwargs)
+                return func(*[Variable(name).eval(scope) for name in arg_names], **kwargs)
             else:
-                return func(*[Variable(name).eval(scope_path) for name in arg_names],
-                            *Variable(var_arg_name).eval(scope_path).elements, **kwargs)
+                return func(*[Variable(name).eval(scope) for name in arg_names],
+                            *Variable(var_arg_name).eval(scope).elements, **kwargs)
         else:
             if var_arg_name is None:
-                return func(*[Variable(name).eval(scope_path) for name in arg_names])
+                return func(*[Variable(name).eval(scope) for name in arg_names])
             else:
-                return func(*[Variable(name).eval(scope_path) for name in arg_names],
-                            *Variable(var_arg_name).eval(scope_path).elements)
-
-    return Function(PrimitiveCall(primitive_func),
-                    (),
-                    [name for name in arg_names if name != "this"],
-                    var_arg_name)
+                return func(*[Variable(name).eval(scope) for name in arg_names],
+                            *Variable(var_arg_name).eval(scope).elements)
+
+    function = Function(PrimitiveCall(primitive_func),
+                        Variable.table,
+                        [name for name in arg_names if name != "this"],
+                        var_arg_name)
+    if not has_kw_arg and "this" not in arg_names[1:]:  # Otherwise only the frame can hand over the arguments
+        if arg_names[:1] == ["this"]:
+            function.native = func
+        else:
+            def native(this: Type[Object], *args: Type[Object]) -> Type[Object]:
+                return func(*args)
+            function.native = native
+    return function
 
 
 class Class(IPrimitiveType):
+    __slots__ = ("name", "methods", "parent", "parent_scope", "table", "table_version", "version", "subclasses",
+                 "__weakref__")
+
     def __init__(self,
                  name: str = "",
                  methods: Dict[str, "Function"] = {},
                  statics: Dict[str, Type[Object]] = {},
-                 parent_scope: tuple = (),
+                 parent_scope: Optional["Scope"] = None,
                  parent: Optional["Class"] = None) -> None:
         self.name = name
         self.methods = methods
         self.parent = parent
         self.parent_scope = parent_scope
+        self.table: Dict[str, "Function"] = {}
+        self.table_version = -1  # Built on first use
+        self.version = 0  # Bumped when this class or a parent changes its methods, caches check it
+        self.subclasses: WeakSet = WeakSet()
+        if parent is not None:
+            parent.subclasses.add(self)
         if self.name != "ClassType":
             super().__init__(class_class)
-            self.attributes.update(statics)
+            if statics:
+                self.attributes = dict(statics)
+
+    def method_table(self) -> Dict[str, "Function"]:  # Own methods merged over every parent's
+        if self.table_version != self.version:
+            table = dict(self.parent.method_table()) if self.parent is not None else {}
+            table.update(self.methods)
+            self.table = table
+            self.table_version = self.version
+        return self.table
 
     def has_method(self, index: str) -> bool:
-        return (index in self.methods or
-                (self.parent is not None and self.parent.has_method(index)))
+        return index in self.method_table()
 
     def get_method(self, index: str) -> "Function":
-        return self.methods.get(index, self.parent.get_method(index) if self.parent is not None else None)
+        return self.method_table().get(index)
+
+    def set_method(self, index: str, method: "Function") -> None:
+        self.methods[index] = method
+        self.changed()
+
+    def changed(self) -> None:  # Every subclass inherits the change, so their caches go stale too
+        self.version += 1
+        for subclass in self.subclasses:
+            subclass.changed()
 
     def __repr__(self):
         return self.name
 
+    __hash__ = object.__hash__  # Classes are compared by identity, this lets them key Python dicts
+    __eq__ = object.__eq__
+
 
 class ClassCreate(IComputable):
     def __init__(self,
@@ -264,15 +399,18 @@ class ClassCreate(IComputable):
         self.methods = methods
         self.statics = statics
         self.parent_name = parent_name
+        self.parent = Variable(parent_name) if parent_name is not None else None
 
-    def eval(self, scope_path: tuple) -> Class:
-        return Class(self.name,
-                     {name: value.eval(scope_path) for name, value in self.methods.items()},
-                     {name: value.eval(scope_path) for name, value in self.statics.items()},
-                     scope_path,
-                     Variable(self.parent_name).eval(scope_path)
-                     if self.parent_name is not None
-                     else None)
+    def eval(self, scope: Scope) -> Class:
+        cls = Class(self.name,
+                    {name: value.eval(scope) for name, value in self.methods.items()},
+                    {name: value.eval(scope) for name, value in self.statics.items()},
+                    scope,
+                    self.parent.eval(scope)
+                    if self.parent is not None
+                    else None)
+        cls.method_table()
+        return cls
 
 
 def class_equal(this: Class, other: Class):
@@ -290,35 +428,63 @@ class ConstructorCall(Call):
                  kwargs=None) -> None:
         self.type = type
         self.args = args
-        self.kwargs = Constant(NoneType()) if kwargs is None else kwargs
+        self.kwargs = kwargs  # None when the call passes no keyword arguments
+        self.spread = spreads(args)
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        t = self.type.eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        t = self.type.eval(scope)
         if t.name in forward_declarations:
             new_obj = forward_declarations[t.name]()
         else:
             new_obj = Object(t)
 
         if new_obj.has("constructor"):
-            constructor = new_obj.get("constructor")
-            new_locals = create_locals(constructor,
-                                       [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=new_obj)
-            Call.do_call(constructor, new_locals)
+            args, kwargs = evaluate_arguments(self, scope)
+            call_method(new_obj, new_obj.get("constructor"), args, kwargs)
         return new_obj
 
 
+class MemberCache:  # One site's lookups by receiver class, each valid until that class's methods change
+    __slots__ = ("members",)
+
+    def __init__(self) -> None:
+        self.members: Dict[Class, Tuple[Type[Object], int]] = {}
+
+    def __reduce__(self):  # Never cached on disk, the classes only exist at run time
+        return (MemberCache, ())
+
+    def __repr__(self) -> str:
+        return f"MemberCache({len(self.members)})"
+
+    def lookup(self, obj: Type[Object], name: str, use_parent=False) -> Optional[Type[Object]]:
+        attributes = obj.attributes
+        if attributes is not None and name in attributes:  # Attributes shadow methods, so they are never cached
+            return attributes[name]
+        cls = obj.type
+        entry = self.members.get(cls)
+        if entry is not None and entry[1] == cls.version:
+            return entry[0]
+        member = cls.get_method(name) if not use_parent else cls.parent.get_method(name)
+        if member is not None and (entry is not None or len(self.members) < MEMBER_CACHE_SIZE):
+            self.members[cls] = (member, cls.version)
+        return member
+
+
+MEMBER_CACHE_SIZE = 4  # Classes remembered per site before it's treated as megamorphic
+
+
 class MemberAccess(IComputable, IAssignable):
     def __init__(self, object: Type[IComputable], name: str) -> None:
         self.object = object
         self.name = name
+        self.cache = MemberCache()
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        obj = self.object.eval(scope_path)
-        return obj.get(self.name)
+    def eval(self, scope: Scope) -> Type[Object]:
+        obj = self.object.eval(scope)
+        return self.cache.lookup(obj, self.name)
 
-    def set_value(self, scope_path: tuple, value: Object) -> None:
-        self.object.eval(scope_path).set(self.name, value)
+    def set_value(self, scope: Scope, value: Object) -> None:
+        self.object.eval(scope).set(self.name, value)
 
 
 class MemberCall(Call):
@@ -330,26 +496,31 @@ class MemberCall(Call):
         self.object = object
         self.name = name
         self.args = args
-        self.kwargs = Constant(NoneType()) if kwargs is None else kwargs
+        self.kwargs = kwargs  # None when the call passes no keyword arguments
+        self.spread = spreads(args)
+        self.cache = MemberCache()
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        obj = self.object.eval(scope_path)
-        f = obj.get(self.name)
-        func = f
+    def eval(self, scope: Scope) -> Type[Object]:
+        obj = self.object.eval(scope)
+        f = get_member(obj, self.name, cache=self.cache)
+        return call_member(obj, f, *evaluate_arguments(self, scope))
 
-        if f is None:
-            raise IndexError
 
-        if type(f) is not Function:
-            func = f.get("#call")
-            new_locals = create_locals(func,
-                                       [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=f)
-        else:
-            new_locals = create_locals(func, [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=obj)
+def get_member(obj: Type[Object], name: str, *, use_parent=False,
+               cache: Optional[MemberCache] = None) -> Type[Object]:
+    f = obj.get(name, use_parent=use_parent) if cache is None else cache.lookup(obj, name, use_parent)
+    if f is None:
+        raise IndexError
+    return f
+
 
-        return Call.do_call(func, new_locals)
+def call_member(obj: Type[Object],
+                f: Type[Object],
+                args: List[Type[Object]],
+                kwargs: Optional[Type[Object]]) -> Type[Object]:
+    if type(f) is not Function:
+        return call_method(f, f.get("#call"), args, kwargs)
+    return call_method(obj, f, args, kwargs)
 
 
 class ParentCall(Call):
@@ -359,41 +530,33 @@ class ParentCall(Call):
                  kwargs=None):
         self.name = name
         self.args = args
-        self.kwargs = Constant(NoneType()) if kwargs is None else kwargs
+        self.kwargs = kwargs  # None when the call passes no keyword arguments
+        self.spread = spreads(args)
+        self.this = Variable("this")
+        self.cache = MemberCache()
 
-    def eval(self, scope_path: tuple):
-        obj = Variable("this").eval(scope_path)
-        f = obj.get(self.name, use_parent=True)
-        func = f
-
-        if f is None:
-            raise IndexError
-
-        if type(f) is not Function:
-            func = f.get("#call")
-            new_locals = create_locals(func,
-                                       [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=f)
-        else:
-            new_locals = create_locals(func, [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=obj)
-
-        return Call.do_call(func, new_locals)
+    def eval(self, scope: Scope):
+        obj = self.this.eval(scope)
+        f = get_member(obj, self.name, use_parent=True, cache=self.cache)
+        return call_member(obj, f, *evaluate_arguments(self, scope))
 
 
 class Destructuring(IAssignable):
     def __init__(self, names: List[str]):
         self.names = names
 
-    def set_value(self, scope_path: tuple, value: Type[Object]):
+    def set_value(self, scope: Scope, value: Type[Object]):
         for name in self.names:
-            Variable(name).set_value(scope_path, value.get(name))
+            Variable(name).set_value(scope, value.get(name))
 
 
 class Function(IPrimitiveType):  # TODO: Optional/default arguments
+    __slots__ = ("operation", "parent_scope", "arg_names", "var_arg_name", "default_args", "bound_object",
+                 "layout", "cell_slots", "cells", "native", "this_slot", "reads_kwargs")
+
     def __init__(self,
                  operation: Type[IComputable],
-                 parent_scope: tuple,
+                 parent_scope: Optional["Scope"],
                  arg_names: Iterable[str],
                  var_arg_name: Optional[str] = None,
                  **kwargs) -> None:
@@ -403,9 +566,22 @@ class Function(IPrimitiveType):  # TODO: Optional/default arguments
         self.var_arg_name = var_arg_name
         self.default_args = kwargs.get("default_args", [])
         self.bound_object = kwargs.get("bound", None)
+        self.layout = kwargs.get("layout") or function_layout(arg_names, var_arg_name)
+        self.cell_slots = kwargs.get("cell_slots", ())
+        self.cells = kwargs.get("cells", ())
+        self.native: Optional[Callable] = None  # A builtin taking this and the arguments, it needs no frame
+        self.reads_kwargs = kwargs.get("reads_kwargs", True)  # Otherwise #kwargs is never made
+        this_slot = self.layout.get("this")
+        # Arguments go straight into the first slots, unless repeated names moved them
+        self.this_slot = this_slot if this_slot == len(arg_names) + (var_arg_name is not None) else None
         super().__init__(function_class)
 
 
+def function_layout(arg_names: Iterable[str], var_arg_name: Optional[str] = None) -> Dict[str, int]:
+    names = list(arg_names) + ([var_arg_name] if var_arg_name is not None else []) + ["this", "#kwargs"]
+    return {name: index for index, name in enumerate(dict.fromkeys(names))}
+
+
 class FunctionCreate(IComputable):
     def __init__(self,
                  operation: Type[IComputable],
@@ -416,43 +592,80 @@ class FunctionCreate(IComputable):
         self.arg_names = arg_names
         self.var_arg_name = var_arg_name
         self.default_args = kwargs.get("default_args", [])
+        self.layout: Optional[Dict[str, int]] = None  # Filled in by the resolver
+        self.keeps_parent = True  # Whether the body can read the frame it's created in
+        self.cell_slots: Tuple[int, ...] = ()
+        self.closure_slots: Tuple[int, ...] = ()  # Where the cells it captures sit in the creating frame
+        self.reads_kwargs = True
 
-    def eval(self, scope_path: tuple) -> Function:
+    def eval(self, scope: Scope) -> Function:
         return Function(self.operation,
-                        scope_path,
+                        scope if self.keeps_parent else None,
                         self.arg_names,
                         self.var_arg_name,
-                        default_args=[default_arg.eval(scope_path)
-                                      for default_arg in self.default_args])
+                        default_args=[default_arg.eval(scope)
+                                      for default_arg in self.default_args],
+                        layout=self.layout,
+                        cell_slots=self.cell_slots,
+                        cells=capture_cells(scope, self.closure_slots),
+                        reads_kwargs=self.reads_kwargs)
+
+
+def capture_cells(scope: Scope, closure_slots: Tuple[int, ...]) -> Tuple[Cell, ...]:
+    if not closure_slots:
+        return ()
+    slots = scope.slots
+    return tuple(slots[index] for index in closure_slots)
 
 
 def create_locals(func: Function,
-                  args: List[Union[Type[Object], List[Type[Object]], Dict]],
-                  kwargs: Dict[str, Type[Object]],
+                  args: List[Type[Object]],
+                  kwargs: Optional[Type[Object]],
                   **options) -> LocalsType:  # TODO: Add parent variable
-    unpacked_args = []
-    for obj in args:
-        if type(obj) is list:
-            unpacked_args.extend(obj)
-        elif type(obj) is dict:
-            kwargs.update(obj)
-        else:
-            unpacked_args.append(obj)
-    new_locals = {name: arg for name, arg in zip(func.arg_names, unpacked_args)}
-    if len(func.arg_names) > len(unpacked_args):
-        assert(len(func.default_args) + len(unpacked_args) >= len(func.arg_names))
+    new_locals = {name: arg for name, arg in zip(func.arg_names, args)}
+    if len(func.arg_names) > len(args):
+        assert(len(func.default_args) + len(args) >= len(func.arg_names))
         new_locals.update({name: arg for name, arg in
                            zip(reversed(func.arg_names),
-                               func.default_args[:len(func.arg_names) - len(unpacked_args)])})
+                               func.default_args[:len(func.arg_names) - len(args)])})
     if func.var_arg_name is not None:
-        new_locals[func.var_arg_name] = forward_declarations["array"](unpacked_args[len(func.arg_names):])
+        new_locals[func.var_arg_name] = forward_declarations["array"](args[len(func.arg_names):])
     new_locals["this"] = (func.bound_object
                           if func.bound_object is not None
                           else options.get("object", create_none()))
-    new_locals["#kwargs"] = forward_declarations["dict"](kwargs)
+    new_locals["#kwargs"] = kwargs if kwargs is not None else forward_declarations["dict"]({})
     return new_locals
 
 
+def spreads(args: Iterable[Type[IComputable]]) -> bool:  # Decided once per call site, most never spread
+    return any(type(arg) is UnpackOperation for arg in args)
+
+
+def spread_arguments(values: List[Union[Type[Object], List[Type[Object]], Dict]],
+                     kwargs: Optional[Type[Object]]) -> Tuple[List[Type[Object]], Optional[Type[Object]]]:
+    args = []
+    for value in values:
+        if type(value) is list:
+            args.extend(value)
+        elif type(value) is dict:
+            kwargs = forward_declarations["dict"]({**(kwargs.elements if kwargs is not None else {}), **value})
+        else:
+            args.append(value)
+    return args, kwargs
+
+
+def plain_call(call: IComputable) -> bool:  # Positional arguments only, compiled engines pass them as they are
+    return not call.spread and call.kwargs is None
+
+
+def evaluate_arguments(call: IComputable, scope: Scope) -> Tuple[List[Type[Object]], Optional[Type[Object]]]:
+    args = [arg.eval(scope) for arg in call.args]
+    kwargs = call.kwargs.eval(scope) if call.kwargs is not None else None
+    if call.spread:
+        return spread_arguments(args, kwargs)
+    return args, kwargs
+
+
 class FunctionCall(Call):
     def __init__(self,
                  function: Type[IComputable],
@@ -460,35 +673,85 @@ class FunctionCall(Call):
                  kwargs=None) -> None:
         self.function = function
         self.args = args
-        self.kwargs = Constant(NoneType()) if kwargs is None else kwargs
-
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        f = self.function.eval(scope_path)
-        func = f
-        if type(f) is not Function:
-            func = f.get("#call")
-            new_locals = create_locals(func,
-                                       [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path), object=f)
-        else:
-            new_locals = create_locals(func, [arg.eval(scope_path) for arg in self.args],
-                                       self.kwargs.eval(scope_path))
+        self.kwargs = kwargs  # None when the call passes no keyword arguments
+        self.spread = spreads(args)
+
+    def eval(self, scope: Scope) -> Type[Object]:
+        f = self.function.eval(scope)
+        return call_function(f, *evaluate_arguments(self, scope))
+
+
+def call_function(f: Type[Object],
+                  args: List[Type[Object]],
+                  kwargs: Optional[Type[Object]]) -> Type[Object]:
+    if type(f) is not Function:
+        return call_method(f, f.get("#call"), args, kwargs)
+    return call_method(create_none(), f, args, kwargs)
+
+
+def call_method(this: Type[Object],
+                func: Function,
+                args: List[Type[Object]],
+                kwargs: Optional[Type[Object]]) -> Type[Object]:
+    if func.native is not None and fits_native(func, args):
+        return call_native(func, this, args)
+    this_slot = func.this_slot
+    if this_slot is None:
+        return Call.do_call(func, create_locals(func, args, kwargs, object=this))
+
+    scope = Scope(func.layout, func.parent_scope)  # Binds like create_locals, without the dict in between
+    slots = scope.slots
+    count = len(func.arg_names)
+    given = len(args)
+    if given == count:
+        slots[:count] = args
+    elif given > count:
+        slots[:count] = args[:count]
+    else:
+        assert(len(func.default_args) + given >= count)
+        slots[:given] = args
+        for index in range(count - given):
+            slots[count - 1 - index] = func.default_args[index]
+    if func.var_arg_name is not None:
+        slots[count] = forward_declarations["array"](args[count:])
+    slots[this_slot] = this if func.bound_object is None else func.bound_object
+    if func.reads_kwargs:
+        slots[func.layout["#kwargs"]] = kwargs if kwargs is not None else forward_declarations["dict"]({})
+    return Call.run(func, scope)
 
-        return Call.do_call(func, new_locals)
 
+def fits_native(func: Function, args: List[Type[Object]]) -> bool:  # Padded or cut args need a frame
+    return len(args) == len(func.arg_names) or (func.var_arg_name is not None and len(args) > len(func.arg_names))
+
+
+def call_native(func: Function, this: Type[Object], args: List[Type[Object]]) -> Type[Object]:
+    result = func.native(this if func.bound_object is None else func.bound_object, *args)
+    return result if result is not None else create_none()
 
-def best_fitting_method(operator_name, obj, pos, length):
-    if obj.has(operator_name + f"_{str(pos)}"):
-        return (obj.get(operator_name + f"_{str(pos)}"), True)
-    elif pos == 0 and length == 2 and obj.has(operator_name + "_left"):
-        return (obj.get(operator_name + "_left"), True)
-    elif pos == 1 and length == 2 and obj.has(operator_name + "_right"):
-        return (obj.get(operator_name + "_right"), True)
 
-    if obj.has(operator_name):
-        return (obj.get(operator_name), False)
+overload_name_table: Dict[str, Tuple[List[str], str, str]] = {}
+
+
+def overload_names(operator_name: str) -> Tuple[List[str], str, str]:  # Formatted once per operator
+    names = overload_name_table.get(operator_name)
+    if names is None:
+        names = overload_name_table[operator_name] = ([f"{operator_name}_{pos}" for pos in range(4)],
+                                                      operator_name + "_left",
+                                                      operator_name + "_right")
+    return names
+
+
+def best_fitting_method(operator_name, obj, pos, length):
+    positional, left, right = overload_names(operator_name)
+    method = obj.get(positional[pos] if pos < len(positional) else f"{operator_name}_{pos}")
+    if method is not None:
+        return (method, True)
+    if length == 2:
+        method = obj.get(left if pos == 0 else right)
+        if method is not None:
+            return (method, True)
 
-    return (None, False)
+    return (obj.get(operator_name), False)
 
 
 def resolve_overload(operator_name, objects):
@@ -521,25 +784,78 @@ class OperatorCall(Call):
         self.name = name
         self.arguments = arguments
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        objs = [arg.eval(scope_path) for arg in self.arguments]
+    def eval(self, scope: Scope) -> Type[Object]:
+        return call_operator(self.name, [arg.eval(scope) for arg in self.arguments])
 
-        f, position, owner = resolve_overload(self.name, objs)
-        if f is None:
-            raise f"Cant perform {self.name} on objects of types\
-                    {', '.join([str(obj.type) for obj in objs])}"
 
-        del objs[position]
+class OperatorCache:  # The overload chosen per operator and operand classes, valid until one of them changes
+    __slots__ = ("entries", "names")
 
-        new_locals = create_locals(f, objs, forward_declarations["dict"]({}), object=owner)
+    def __init__(self) -> None:
+        self.entries: Dict[tuple, Tuple[Tuple[Type[Object], int, Optional[Callable]], int]] = {}
+        self.names: Dict[str, Set[str]] = {}  # Every attribute that can overload each operator
+
+    def __repr__(self) -> str:
+        return f"OperatorCache({len(self.entries)})"
+
+    def shadowed(self, name: str, obj: Type[Object]) -> bool:  # Instance attributes win over the classes
+        names = self.names.get(name)
+        if names is None:
+            positional, left, right = overload_names(name)
+            names = self.names[name] = {*positional, left, right, name}
+        return not names.isdisjoint(obj.attributes)
+
+    def resolve(self, name: str, objs: List[Type[Object]]) -> Tuple[Optional[Type[Object]], int, Optional[Callable]]:
+        entries = self.entries
+        for obj in objs:
+            if obj.attributes is not None and self.shadowed(name, obj):
+                return (*resolve_overload(name, objs)[:2], None)
+        if len(objs) == 2:
+            first, second = objs[0].type, objs[1].type
+            key = (name, first, second)
+            version = first.version + second.version  # Versions only grow, so the sum moves whenever one does
+        else:
+            key = (name, *[obj.type for obj in objs])
+            version = sum(obj.type.version for obj in objs)
+        cached = entries.get(key)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+        f, position, _ = resolve_overload(name, objs)
+        native = None
+        if type(f) is Function and f.bound_object is None and fits_native(f, objs[:position] + objs[position + 1:]):
+            native = f.native
+        entry = (f, position, native)
+        if f is not None:
+            entries[key] = (entry, version)
+        return entry
+
+
+operator_cache = OperatorCache()
+
+
+def call_operator(name: str, objs: List[Type[Object]]) -> Type[Object]:
+    f, position, native = operator_cache.resolve(name, objs)
+    if f is None:
+        raise f"Cant perform {name} on objects of types\
+                {', '.join([str(obj.type) for obj in objs])}"
 
-        return Call.do_call(f, new_locals)
+    owner = objs.pop(position)
+    if native is not None:
+        result = native(owner, *objs)
+        return result if result is not None else create_none()
+
+    return call_method(owner, f, objs, None)
 
 
 class NoneType(IPrimitiveType):
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(none_class)
 
+    def __reduce__(self):
+        return (create_none, ())
+
 
 def none_to_string(this):
     return forward_declarations["string"]("null")
@@ -557,16 +873,21 @@ def none_to_float(this):
     return forward_declarations["float"](0.0)
 
 
+def share(obj: Type[Object]) -> Type[Object]:
+    shared_objects.add(id(obj))
+    return obj
+
+
 def create_none():
-    return ConstructorCall(Variable("NoneType"), []).eval(())
+    return none_object
 
 
 class UnpackOperation(IComputable):
     def __init__(self, value: Type[IComputable]) -> None:
         self.value = value
 
-    def eval(self, scope_path: tuple) -> List[Type[Object]]:
-        return unpack(self.value.eval(scope_path))
+    def eval(self, scope: Scope) -> List[Type[Object]]:
+        return unpack(self.value.eval(scope))
 
 
 def unpack(obj: Type[Object]):
@@ -577,19 +898,19 @@ def unpack(obj: Type[Object]):
 
 
 def register_class(name: str, cls, type: Class) -> None:
-    Variable.table[(name,)] = type
+    Variable.table.elements[name] = type
     forward_declarations[name] = cls
 
 
 def register_function(name, func):
-    Variable.table[(name,)] = func
+    Variable.table.elements[name] = func
 
 
 class_class = Class("ClassType", {})
 function_class = Class("FunctionType", {})
 
-class_class.methods["#equal"] = to_primitive_function(class_equal)
-class_class.methods["#not_equal"] = to_primitive_function(class_not_equal)
+class_class.set_method("#equal", to_primitive_function(class_equal))
+class_class.set_method("#not_equal", to_primitive_function(class_not_equal))
 Object.__init__(class_class, class_class)
 
 
@@ -605,6 +926,8 @@ register_class("ClassType", Class, class_class)
 register_class("FunctionType", Function, function_class)
 register_class("NoneType", NoneType, none_class)
 
+none_object = share(NoneType())  # Shared by every null
+
 
 def type_function(object: Type[Object]) -> Class:
     return object.type
@@ -1,24 +1,48 @@
 from .base import Class, IPrimitiveType, Object, forward_declarations
 from .base import NoneType, to_primitive_function, register_class
-from .base import OperatorCall, Constant, MemberCall, IComputable
+from .base import IComputable
 from .base import UnpackOperation, Variable, ConstructorCall
-from .base import IAssignable
-from .logic import Bool
-from .numerical import Int
-from .exceptions import raise_stop_iter
-from .flow_control import ListComprehensionConstant
+from .base import IAssignable, Scope, MemberCache, get_member, call_member
+from .base import spreads, spread_arguments, call_operator
+from .logic import Bool, create_bool
+from .numerical import Int, Float, create_int
+from .text import String
+from .flow_control import ListComprehensionConstant, NativeIterator
 from typing import List, Type, Dict
 
 
 class Tuple(IPrimitiveType):
+    __slots__ = ("elements", "hash_value")
+
     def __init__(self, elements=()) -> None:
         self.elements = tuple(elements)
-        self.iter_current = 0
+        self.hash_value = None  # Kept once known, if no element can change its hash
         super().__init__(tuple_class)
 
+    def __hash__(self):
+        if self.hash_value is not None:
+            return self.hash_value
+        value = hash(self.elements)
+        if all(type(elem) in HASH_STABLE_TYPES and (type(elem) is not Tuple or elem.hash_value is not None)
+               for elem in self.elements):
+            self.hash_value = value
+        return value
+
+    def __eq__(self, other):
+        if type(other) is Tuple:
+            return self.elements == other.elements
+        return NotImplemented
+
+    def __iter__(self):
+        return iter(self.elements)
+
+
+HASH_STABLE_TYPES = {String, Int, Float, Bool, Tuple}  # User objects can change what #hash returns
+
 
 def tuple_constructor(this: Tuple, *args: Type[Object]):
     this.elements = tuple(args)
+    this.hash_value = None
 
 
 def tuple_get_item(this: Tuple, index: Int) -> Type[Object]:
@@ -31,43 +55,33 @@ def tuple_combine(this: Tuple, other: Tuple) -> Tuple:
 
 
 def tuple_length(this: Tuple) -> Int:
-    return Int(len(this.elements))
+    return create_int(len(this.elements))
 
 
 def tuple_equal(this: Tuple, other: Tuple) -> Bool:
     if len(this.elements) != len(other.elements):
-        return Bool(False)
-    return Bool(all(OperatorCall("#equal", [Constant(elem1), Constant(elem2)]).eval(()).value
+        return create_bool(False)
+    return create_bool(all(call_operator("#equal", [elem1, elem2]).value
                 for elem1, elem2 in zip(this.elements, other.elements)))
 
 
 def tuple_not_equal(this: Tuple, other: Tuple) -> Bool:
     if len(this.elements) != len(other.elements):
-        return Bool(True)
-    return Bool(any(not(OperatorCall("#equal", [Constant(elem1), Constant(elem2)]).eval(()).value)
+        return create_bool(True)
+    return create_bool(any(not(call_operator("#equal", [elem1, elem2]).value)
                     for elem1, elem2 in zip(this.elements, other.elements)))
 
 
 def tuple_hash(this: Tuple) -> Int:
-    return Int(hash(this.elements))
+    return create_int(hash(this))
 
 
 def tuple_to_bool(this: Tuple) -> Bool:
-    return Bool(bool(len(this.elements)))
-
-
-def tuple_iter(this: Tuple) -> Tuple:
-    this.iter_current = 0
-    return this
+    return create_bool(bool(len(this.elements)))
 
 
-def tuple_next(this: Tuple) -> Type[Object]:
-    if this.iter_current < len(this.elements):
-        result = this.elements[this.iter_current]
-        this.iter_current += 1
-        return result
-    else:
-        return raise_stop_iter()
+def tuple_iter(this: Tuple) -> NativeIterator:
+    return NativeIterator(iter(this.elements))
 
 
 def tuple_to_string(this: Tuple):
@@ -88,7 +102,6 @@ tuple_class = Class("tuple", {
     "#hash":            to_primitive_function(tuple_hash),
     "#to_bool":         to_primitive_function(tuple_to_bool),
     "#iter":            to_primitive_function(tuple_iter),
-    "#next":            to_primitive_function(tuple_next),
     "#to_string":       to_primitive_function(tuple_to_string)
 }, {
     "#call":            to_primitive_function(static_tuple_call)
@@ -96,11 +109,15 @@ tuple_class = Class("tuple", {
 
 
 class Array(IPrimitiveType):
+    __slots__ = ("elements",)
+
     def __init__(self, elements: List[Type[Object]] = []) -> None:
         self.elements = list(elements)
-        self.iter_current = 0
         super().__init__(array_class)
 
+    def __iter__(self):
+        return iter(self.elements)
+
 
 def array_constructor(this: Array, *args):
     this.elements = list(args)
@@ -129,7 +146,7 @@ def array_combine(this: Array, other: Array) -> Array:
 
 
 def array_length(this: Array):
-    return Int(len(this.elements))
+    return create_int(len(this.elements))
 
 
 def array_add(this: Array, value: Type[Object]) -> NoneType:
@@ -145,34 +162,24 @@ def array_insert(this: Array, index: Int, value: Type[Object]) -> NoneType:
 
 def array_equal(this: Array, other: Array) -> Bool:  # TODO
     if len(this.elements) != len(other.elements):
-        return Bool(False)
-    return Bool(all(OperatorCall("#equal", [Constant(elem1), Constant(elem2)]).eval(()).value
+        return create_bool(False)
+    return create_bool(all(call_operator("#equal", [elem1, elem2]).value
                 for elem1, elem2 in zip(this.elements, other.elements)))
 
 
 def array_not_equal(this: Tuple, other: Tuple) -> Bool:
     if len(this.elements) != len(other.elements):
-        return Bool(True)
-    return Bool(any(not(OperatorCall("#equal", [Constant(elem1), Constant(elem2)]).eval(()).value)
+        return create_bool(True)
+    return create_bool(any(not(call_operator("#equal", [elem1, elem2]).value)
                     for elem1, elem2 in zip(this.elements, other.elements)))
 
 
 def array_to_bool(this: Array) -> Bool:
-    return Bool(bool(len(this.elements)))
-
-
-def array_iter(this: Array) -> Array:
-    this.iter_current = 0
-    return this
+    return create_bool(bool(len(this.elements)))
 
 
-def array_next(this: Array) -> Array:
-    if this.iter_current < len(this.elements):
-        result = this.elements[this.iter_current]
-        this.iter_current += 1
-        return result
-    else:
-        return raise_stop_iter()
+def array_iter(this: Array) -> NativeIterator:
+    return NativeIterator(iter(this.elements))
 
 
 def array_to_string(this: Array):
@@ -196,7 +203,6 @@ array_class = Class("array", {
     "#not_equal":       to_primitive_function(array_not_equal),
     "#to_bool":         to_primitive_function(array_to_bool),
     "#iter":            to_primitive_function(array_iter),
-    "#next":            to_primitive_function(array_next),
     "#to_string":       to_primitive_function(array_to_string)
 }, {
     "#call":            to_primitive_function(static_array_call)
@@ -204,10 +210,15 @@ array_class = Class("array", {
 
 
 class Dictionary(IPrimitiveType):
+    __slots__ = ("elements",)
+
     def __init__(self, elements: Dict[Type[Object], Type[Object]] = {}):
         self.elements = elements
         super().__init__(dictionary_class)
 
+    def __iter__(self):  # Over a snapshot of the keys, like #iter
+        return iter(tuple(self.elements))
+
 
 def dict_constructor(this: Dictionary, arg: Type[Object]) -> None:
     if arg.type.name == "dictionary":
@@ -259,9 +270,8 @@ def dict_items(this: Dictionary) -> Tuple:
     return Tuple((Tuple(pair) for pair in zip(this.elements.keys(), this.elements.values())))
 
 
-def dict_iter(this: Dictionary) -> Tuple:
-    keys = this.call("keys")
-    return keys.call("#iter")
+def dict_iter(this: Dictionary) -> NativeIterator:
+    return NativeIterator(iter(tuple(this.elements)))
 
 
 def dict_to_string(this: Dictionary):
@@ -269,11 +279,11 @@ def dict_to_string(this: Dictionary):
 
 
 def dict_length(this: Dictionary):
-    return Int(len(this.elements))
+    return create_int(len(this.elements))
 
 
 def dict_to_bool(this: Dictionary) -> Bool:
-    return Bool(bool(len(this.elements)))
+    return create_bool(bool(len(this.elements)))
 
 
 def static_dict_call(this: Class, arg: Type[Object]) -> Object:
@@ -315,12 +325,21 @@ class ItemAccess(IComputable, IAssignable):
                  arguments: Type[IComputable]):
         self.iterable = iterable
         self.arguments = arguments
+        self.spread = spreads(arguments)
+        self.get_cache = MemberCache()
+        self.set_cache = MemberCache()
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        return MemberCall(self.iterable, "#get_item", self.arguments).eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        obj = self.iterable.eval(scope)
+        args = [arg.eval(scope) for arg in self.arguments]
+        return call_member(obj, get_member(obj, "#get_item", cache=self.get_cache),
+                           *(spread_arguments(args, None) if self.spread else (args, None)))
 
-    def set_value(self, scope_path: tuple, value: Type[Object]) -> Type[Object]:
-        return MemberCall(self.iterable, "#set_item", self.arguments + [Constant(value)]).eval(scope_path)
+    def set_value(self, scope: Scope, value: Type[Object]) -> Type[Object]:
+        obj = self.iterable.eval(scope)
+        args = [arg.eval(scope) for arg in self.arguments] + [value]
+        return call_member(obj, get_member(obj, "#set_item", cache=self.set_cache),
+                           *(spread_arguments(args, None) if self.spread else (args, None)))
 
 
 class ArrayConstant(IComputable, IAssignable):
@@ -328,19 +347,19 @@ class ArrayConstant(IComputable, IAssignable):
                  arguments: List[Type[IComputable]]) -> None:
         self.arguments = arguments
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         if len(self.arguments) == 1 and isinstance(self.arguments[0], ListComprehensionConstant):
-            return Variable("array").eval(()).call("#call", self.arguments[0].eval(scope_path))
-        return ConstructorCall(Variable("array"), self.arguments).eval(scope_path)
+            return Variable("array").eval(Variable.table).call("#call", self.arguments[0].eval(scope))
+        return ConstructorCall(Variable("array"), self.arguments).eval(scope)
 
-    def set_value(self, scope_path: tuple, value) -> Type[Object]:
+    def set_value(self, scope: Scope, value) -> Type[Object]:
         iterator = iter(value)
         for arg in self.arguments[:-1]:
-            arg.set_value(scope_path, next(iterator))
+            arg.set_value(scope, next(iterator))
         if isinstance(self.arguments[-1], UnpackOperation):
-            self.arguments[-1].value.set_value(scope_path, Tuple(iterator))
+            self.arguments[-1].value.set_value(scope, Tuple(iterator))
         else:
-            self.arguments[-1].set_value(scope_path, next(iterator))
+            self.arguments[-1].set_value(scope, next(iterator))
 
 
 class TupleConstant(IComputable):
@@ -348,22 +367,22 @@ class TupleConstant(IComputable):
                  arguments: List[Type[IComputable]]) -> None:
         self.arguments = arguments
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         if len(self.arguments) == 1 and isinstance(self.arguments[0], ListComprehensionConstant):
-            return Variable("tuple").call("#call", self.arguments[0].eval(scope_path))
-        return ConstructorCall(Variable("tuple"), self.arguments).eval(scope_path)
+            return Variable("tuple").call("#call", self.arguments[0].eval(scope))
+        return ConstructorCall(Variable("tuple"), self.arguments).eval(scope)
 
 
 class DictionaryConstant(IComputable):
     def __init__(self, lines: List) -> None:
         self.lines = lines
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         result_elems = {}
         for line in self.lines:
             if len(line) == 2:
-                result_elems[line[0].eval(scope_path)] = line[1].eval(scope_path)
+                result_elems[line[0].eval(scope)] = line[1].eval(scope)
             else:
                 assert(isinstance(line[0], UnpackOperation))
-                result_elems.update(line[0].value.eval(scope_path).elements)
+                result_elems.update(line[0].value.eval(scope).elements)
         return Dictionary(result_elems)
@@ -1,5 +1,5 @@
-from .base import Object, IComputable, IPrimitiveType, Class, ConstructorCall
-from .base import Variable, create_none, register_class, Constant
+from .base import Object, IComputable, IPrimitiveType, Class
+from .base import Variable, create_none, register_class, Scope, Completion, ObjectException
 from .statements import StatementList
 from typing import Type, Optional
 
@@ -8,9 +8,8 @@ class RaiseStatement(IComputable):
     def __init__(self, value: IComputable) -> None:
         self.value = value
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        result = self.value.eval(scope_path)
-        raise result
+    def eval(self, scope: Scope) -> Type[Object]:
+        raise ObjectException(self.value.eval(scope))
 
 
 class TryCatch(IComputable):
@@ -24,23 +23,25 @@ class TryCatch(IComputable):
         self.catch_body = catch_body
         self.finally_body = finally_body
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         catch_result = None
         finally_result = None
         try:
-            result = self.try_body.eval(scope_path)
-        except Exception:
-            Variable(self.except_name).set_value(scope_path, result)
-            catch_result = self.catch_body.eval(scope_path)
+            result = self.try_body.eval(scope)
+        except ObjectException as e:
+            Variable(self.except_name).set_value(scope, e.value)
+            catch_result = self.catch_body.eval(scope)
         finally:
             if result.finally_body is not None:
-                finally_result = self.finally_body.eval(scope_path)
-        return (catch_result if catch_result.is_return else
-                finally_result if catch_result.is_return else
+                finally_result = self.finally_body.eval(scope)
+        return (catch_result if type(catch_result) is Completion else
+                finally_result if type(finally_result) is Completion else
                 create_none())
 
 
-class StopIteration(IPrimitiveType, Exception):
+class StopIteration(IPrimitiveType):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(StopIteration_class)
 
@@ -49,7 +50,7 @@ StopIteration_class = Class("StopIteration", {})
 
 
 def raise_stop_iter():
-    return RaiseStatement(ConstructorCall(Constant(StopIteration_class), [])).eval(())
+    raise ObjectException(StopIteration())
 
 
 register_class("StopIteration", StopIteration, StopIteration_class)
@@ -1,11 +1,12 @@
 from .base import IComputable, Object, create_none, FunctionCall, Class
-from .base import unpack, IAssignable, OperatorCall
+from .base import unpack, IAssignable, call_operator
 from .base import IPrimitiveType, register_class, to_primitive_function
-from .base import register_function, Constant, CreateScope
+from .base import register_function, Scope
+from .base import Completion, RETURN, BREAK, CONTINUE, ObjectException
 from .statements import StatementList, IStatement
 from .exceptions import raise_stop_iter
-from .logic import try_bool, Bool
-from typing import Type, Optional, List
+from .logic import try_bool, Bool, create_bool
+from typing import Iterator, Type, Optional, List
 
 
 class IFlowStatement(IStatement):
@@ -21,11 +22,11 @@ class ConditionalStatement(IFlowStatement):
         self.if_body = if_body
         self.else_body = else_body
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        if try_bool(self.condition.eval(scope_path)).value:
-            return self.if_body.eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        if try_bool(self.condition.eval(scope)).value:
+            return self.if_body.eval(scope)
         elif self.else_body is not None:
-            return self.else_body.eval(scope_path)
+            return self.else_body.eval(scope)
 
 
 class ConditionalExpression(IComputable, IAssignable):
@@ -37,42 +38,32 @@ class ConditionalExpression(IComputable, IAssignable):
         self.if_expr = if_expr
         self.else_expr = else_expr
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        condition = self.condition.eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        condition = self.condition.eval(scope)
         if try_bool(condition).value:
-            return (self.if_expr.eval(scope_path) if self.if_expr is not None else condition)
+            return (self.if_expr.eval(scope) if self.if_expr is not None else condition)
         else:
-            return self.else_expr.eval(scope_path)
+            return self.else_expr.eval(scope)
 
-    def set_value(self, scope_path: tuple, value: Type[Object]):
-        condition = self.condition.eval(scope_path)
+    def set_value(self, scope: Scope, value: Type[Object]):
+        condition = self.condition.eval(scope)
         if try_bool(condition).value:
             if self.if_expr is not None:
-                self.if_expr.set_value(scope_path, value)
+                self.if_expr.set_value(scope, value)
             else:
-                self.condition.set_value(scope_path)
+                self.condition.set_value(scope)
         else:
-            self.else_expr.set_vlaue(scope_path, value)
-
-
-class BreakMarker:
-    def __init__(self):
-        self.is_return = True
+            self.else_expr.set_vlaue(scope, value)
 
 
 class BreakStatement(IStatement):  # Needs to be returned
-    def eval(self, scope_path: tuple) -> BreakMarker:
-        return BreakMarker()
-
-
-class ContinueMarker:
-    def __init__(self):
-        self.is_return = True
+    def eval(self, scope: Scope) -> Completion:
+        return BREAK
 
 
 class ContinueStatement(IStatement):
-    def eval(self, scope_path: tuple) -> ContinueMarker:
-        return ContinueMarker()
+    def eval(self, scope: Scope) -> Completion:
+        return CONTINUE
 
 
 class WhileStatement(IFlowStatement):
@@ -82,16 +73,13 @@ class WhileStatement(IFlowStatement):
         self.condition = condition
         self.body = body
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        while try_bool(self.condition.eval(scope_path)).value:
-            result = self.body.eval(scope_path)
-            if result is not None:
-                if type(result) is BreakMarker:
-                    break
-                if type(result) is ContinueMarker:
-                    continue
-                if result.is_return:
-                    return result
+    def eval(self, scope: Scope) -> Type[Object]:
+        while try_bool(self.condition.eval(scope)).value:
+            result = self.body.eval(scope)
+            if result is BREAK:
+                break
+            if result is RETURN:
+                return result
         return create_none()
 
 
@@ -102,19 +90,17 @@ class ForStatement(IFlowStatement):
         self.head = head
         self.body = body
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         if isinstance(self.head, ContainsOperation):
-            for value in self.head.iterable.eval(scope_path):
+            for value in self.head.iterable.eval(scope):
                 try:
-                    self.head.value.set_value(scope_path, value)
+                    self.head.value.set_value(scope, value)
                 except StopIteration:
                     break
-                result = self.body.eval(scope_path)
-                if type(result) is BreakMarker:
+                result = self.body.eval(scope)
+                if result is BREAK:
                     break
-                if type(result) is ContinueMarker:
-                    continue
-                if result.is_return:
+                if result is RETURN:
                     return result
             return create_none()
         else:
@@ -128,17 +114,17 @@ class ContainsOperation(IComputable):
         self.value = value
         self.iterable = iterable
 
-    def eval(self, scope_path: tuple) -> Bool:
-        iter = self.iterable.eval(scope_path)
+    def eval(self, scope: Scope) -> Bool:
+        iter = self.iterable.eval(scope)
         if "#contains" in iter:
-            return Bool(try_bool(FunctionCall(iter["#contains"], [self.value]).eval(scope_path)).value)
+            return create_bool(try_bool(FunctionCall(iter["#contains"], [self.value]).eval(scope)).value)
         elif "#iter" in iter:
-            val = self.value.eval(scope_path)
+            val = self.value.eval(scope)
             iterator = iter.call("#iter")
             for elem in iterator:
-                if OperatorCall("#equal", [Constant(elem), Constant(val)]).eval(()).value:
-                    return Bool(True)
-            return Bool(False)
+                if call_operator("#equal", [elem, val]).value:
+                    return create_bool(True)
+            return create_bool(False)
         raise SyntaxError
 
 
@@ -151,18 +137,20 @@ class ListComprehensionConstant(IComputable):
         self.operation = operation
         self.conditions = conditions
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         return ListComprehension(self.head,
                                  self.operation,
-                                 scope_path,
+                                 scope,
                                  self.conditions)
 
 
 class ListComprehension(IPrimitiveType):
+    __slots__ = ("head", "operation", "scope", "conditions")
+
     def __init__(self,
                  head: Type[IComputable],
                  operation: Type[IComputable],
-                 scope: tuple,
+                 scope: Scope,
                  conditions: List[Type[IComputable]]) -> None:
         self.head = head
         self.operation = operation
@@ -170,29 +158,65 @@ class ListComprehension(IPrimitiveType):
         self.conditions = conditions
         super().__init__(list_comp_class)
 
+    def __iter__(self):
+        return list_comp_values(self)
 
-def list_comp_iter(this: ListComprehension) -> ListComprehension:
-    if isinstance(this.head, ContainsOperation):
-        this.iter = iter(this.head.iterable.eval(this.scope))
-    return this
+
+def list_comp_values(this: ListComprehension) -> Iterator[Type[Object]]:
+    if not isinstance(this.head, ContainsOperation):
+        return
+    iterator = iter(this.head.iterable.eval(this.scope))
+    try:
+        for value in iterator:
+            this.head.value.set_value(this.scope, value)
+            if all(cond.eval(this.scope) for cond in this.conditions):
+                yield this.operation.eval(this.scope)
+    except StopIteration:
+        return
+    except ObjectException as e:  # A StopIteration raised by a step ends the comprehension, as it ended #next
+        if e.value.type.name != "StopIteration":
+            raise
 
 
-def list_comp_next(this: ListComprehension) -> Type[Object]:
-    if isinstance(this.head, ContainsOperation):
-        try:
-            value = next(this.iter)
-        except StopIteration:
-            return raise_stop_iter()
-        this.head.value.set_value(this.scope, value)
-        return (this.operation.eval(this.scope)
-                if all(cond.eval(this.scope) for cond in this.conditions)
-                else list_comp_next(this))
+def list_comp_iter(this: ListComprehension) -> "NativeIterator":
+    return NativeIterator(list_comp_values(this))
 
 
 list_comp_class = Class("ListComprehension", {
-    "#iter":    to_primitive_function(list_comp_iter),
-    "#next":    to_primitive_function(list_comp_next)
+    "#iter":    to_primitive_function(list_comp_iter)
+})
+
+
+class NativeIterator(IPrimitiveType):  # Each #iter of a builtin value gets its own, so loops don't share a position
+    __slots__ = ("iterator",)
+
+    def __init__(self, iterator: Iterator[Type[Object]]) -> None:
+        self.iterator = iterator
+        super().__init__(iterator_class)
+
+    def __iter__(self):
+        return self.iterator
+
+    def __next__(self):
+        return next(self.iterator)
+
+
+def iterator_iter(this: NativeIterator) -> NativeIterator:
+    return this
+
+
+def iterator_next(this: NativeIterator) -> Type[Object]:
+    try:
+        return next(this.iterator)
+    except StopIteration:
+        return raise_stop_iter()
+
+
+iterator_class = Class("iterator", {
+    "#iter":    to_primitive_function(iterator_iter),
+    "#next":    to_primitive_function(iterator_next)
 })
 
 
 register_class("ListComprehension", list_comp_class, ListComprehension)
+register_class("iterator", NativeIterator, iterator_class)
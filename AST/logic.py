@@ -1,9 +1,12 @@
 from .base import Class, IPrimitiveType, forward_declarations, Object, create_none
 from .base import IComputable, to_primitive_function, register_class, register_function
+from .base import Scope, Variable, share
 from typing import Type
 
 
 class Bool(IPrimitiveType):
+    __slots__ = ("value",)
+
     def __init__(self, value: bool = False) -> None:
         self.value = value
         super().__init__(bool_class)
@@ -11,6 +14,17 @@ class Bool(IPrimitiveType):
     def __bool__(self):
         return self.value
 
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):  # Numbers handle bools from their side
+        if type(other) is Bool:
+            return self.value == other.value
+        return NotImplemented
+
+    def __reduce__(self):
+        return (create_bool, (self.value,))
+
 
 def try_bool(obj: Type[Object]):
     if type(obj) is Bool:
@@ -25,12 +39,12 @@ class AndOperation(IComputable):
         self.left = left
         self.right = right
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        left_obj = self.left.eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        left_obj = self.left.eval(scope)
         left_bool = try_bool(left_obj)
         if not left_bool.value:
             return left_obj
-        return self.right.eval(scope_path)
+        return self.right.eval(scope)
 
 
 class OrOperation(IComputable):
@@ -38,34 +52,34 @@ class OrOperation(IComputable):
         self.left = left
         self.right = right
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        left_obj = self.left.eval(scope_path)
+    def eval(self, scope: Scope) -> Type[Object]:
+        left_obj = self.left.eval(scope)
         left_bool = try_bool(left_obj)
         if left_bool.value:
             return left_obj
-        return self.right.eval(scope_path)
+        return self.right.eval(scope)
 
 
 class NotOperation(IComputable):
     def __init__(self, value: IComputable) -> None:
         self.value = value
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        obj = self.value.eval(scope_path)
-        return Bool(not try_bool(obj).value)
+    def eval(self, scope: Scope) -> Type[Object]:
+        obj = self.value.eval(scope)
+        return create_bool(not try_bool(obj).value)
 
 
 def bool_constructor(this: Bool, arg: Type[Object]):
-    this.value = arg.call("#to_bool").eval(())
+    this.value = arg.call("#to_bool").eval(Variable.table)
     return create_none()
 
 
 def bool_equal(this: Bool, other: Bool) -> Bool:
-    return Bool(this.value == other.value)
+    return create_bool(this.value == other.value)
 
 
 def bool_not_equal(this: Bool, other: Bool) -> Bool:
-    return Bool(this.value != other.value)
+    return create_bool(this.value != other.value)
 
 
 def bool_hash(this: Bool):
@@ -97,11 +111,18 @@ bool_class = Class("bool", {
 
 register_class("bool", Bool, bool_class)
 
+true_object = share(Bool(True))
+false_object = share(Bool(False))
+
+
+def create_bool(value: bool) -> Bool:
+    return true_object if value else false_object
+
 
 def is_null_function(value):
     if value.type.name != "NoneType":
-        return Bool(False)
-    return Bool(True)
+        return false_object
+    return true_object
 
 
 register_function("is_null", to_primitive_function(is_null_function))
@@ -1,46 +1,69 @@
 from .base import Class, forward_declarations, register_class
-from .base import to_primitive_function, IPrimitiveType, Object, create_none
-from .logic import Bool
+from .base import to_primitive_function, IPrimitiveType, Object, create_none, share
+from .logic import Bool, create_bool
 from typing import Union, Callable, Type
 from functools import wraps
 
 
 class Numerical(IPrimitiveType):
-    def __init__(self, value: Union[int, float], *args, **kwargs) -> None:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Union[int, float], type: Class) -> None:
         self.value = value
-        super().__init__(*args, **kwargs)
+        Object.__init__(self, type)  # Numbers are made by every operation, so skip the generic super() chain
+
+    def __reduce__(self):
+        return (type(self), (self.value,))
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):
+        if type(other) in numerical_types:
+            return self.value == other.value
+        return NotImplemented
 
 
 class Int(Numerical):
+    __slots__ = ()
+
     def __init__(self, value: int = 0) -> None:
-        super().__init__(value, int_class)
+        Numerical.__init__(self, value, int_class)
+
+    def __reduce__(self):
+        return (create_int, (self.value,))
 
 
 class Float(Numerical):
+    __slots__ = ()
+
     def __init__(self, value: float = 0) -> None:
-        super().__init__(value, float_class)
+        Numerical.__init__(self, value, float_class)
+
+
+numerical_types = frozenset((Int, Float, Bool))
 
 
 def numerical_compatible(fn: Callable):
     @wraps(fn)
     def numerical_compatible_fn(this: Int, other):
-        assert(type(other) in [Int, Float, Bool])
+        assert(type(other) in numerical_types)
         result = fn(this.value, other.value)
-        if type(result) is int:
-            return Int(result)
+        if type(result) is bool:
+            return create_bool(result)
+        elif type(result) is int:
+            return create_int(result)
         elif type(result) is float:
             return Float(result)
-        elif type(result) is bool:
-            return Bool(result)
     return numerical_compatible_fn
 
 
 def numerical_to_bool(this: Type[Numerical]) -> Bool:
-    return Bool(bool(this.value))
+    return create_bool(bool(this.value))
 
 
 def numerical_hash(this: Type[Numerical]) -> Int:
-    return Int(hash(this.value))
+    return create_int(hash(this.value))
 
 
 def numerical_to_string(this: Type[Numerical]):
@@ -115,3 +138,13 @@ float_class = Class("float", float_methods, {
 
 register_class("int", Int, int_class)
 register_class("float", Float, float_class)
+
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 256
+small_ints = [share(Int(value)) for value in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
+
+
+def create_int(value: int) -> Int:
+    if SMALL_INT_MIN <= value <= SMALL_INT_MAX:
+        return small_ints[value - SMALL_INT_MIN]
+    return Int(value)
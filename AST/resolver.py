@@ -0,0 +1,196 @@
+from .base import IComputable, Variable, Assignment, FunctionCreate, GlobalDeclare, Destructuring
+from .base import UnpackOperation, GLOBAL_DEPTH, function_layout, outer_name
+from .flow_control import ForStatement, ContainsOperation, ListComprehensionConstant
+from .collection_types import ArrayConstant
+from .exceptions import TryCatch
+from .visitor import NodeTransformer
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+
+class FunctionScope:  # What the resolver knows about the frames of one function
+    def __init__(self, layout: Dict[str, int], converted: bool, reads_kwargs: bool) -> None:
+        self.layout = layout
+        self.converted = converted  # Reads outer names through cells instead of the parent frames
+        self.reads_kwargs = reads_kwargs  # Calls only make #kwargs for bodies that might read it
+        self.global_names: Set[str] = set()
+        self.run_time_names: Set[str] = set()  # Locals of a deferred body, they have no slot
+        self.assigned: Set[str] = set()  # Locals that aren't parameters, they can be read before they're set
+        self.keeps_parent = False  # The body reads the creating frame, so that frame has to outlive the call
+        self.cells: Set[int] = set()  # Own slots that closures capture
+        self.free: Dict[str, int] = {}  # Slots holding the cells of outer names
+        self.closure_slots: List[int] = []  # Where each free cell sits in the creating frame
+        self.variables: Dict[int, List[Variable]] = {}
+
+
+class LocalsCollector(NodeTransformer):  # Finds the names a function body assigns, not those of nested functions
+    def __init__(self) -> None:
+        self.names: Dict[str, None] = {}
+        self.global_names: Set[str] = set()
+
+    def target(self, target: Any) -> None:
+        if type(target) is Variable:
+            self.names[target.name] = None
+        elif type(target) is Destructuring:
+            for name in target.names:
+                self.names[name] = None
+        elif type(target) is ArrayConstant:
+            for arg in target.arguments:
+                self.target(arg.value if type(arg) is UnpackOperation else arg)
+
+    def visit_Assignment(self, node: Assignment) -> Assignment:
+        self.target(node.object)
+        return self.generic_visit(node)
+
+    def visit_ForStatement(self, node: ForStatement) -> ForStatement:
+        if type(node.head) is ContainsOperation:
+            self.target(node.head.value)
+        return self.generic_visit(node)
+
+    def visit_ListComprehensionConstant(self, node: ListComprehensionConstant) -> ListComprehensionConstant:
+        if type(node.head) is ContainsOperation:
+            self.target(node.head.value)
+        return self.generic_visit(node)
+
+    def visit_TryCatch(self, node: TryCatch) -> TryCatch:
+        if node.except_name is not None:
+            self.names[node.except_name] = None
+        return self.generic_visit(node)
+
+    def visit_GlobalDeclare(self, node: GlobalDeclare) -> GlobalDeclare:
+        self.global_names.add(node.name)
+        return node
+
+    def visit_FunctionCreate(self, node: FunctionCreate) -> FunctionCreate:
+        for default_arg in node.default_args:  # Defaults run in the enclosing frame
+            self.visit(default_arg)
+        return node
+
+    def visit_DeferredBlock(self, node: Any) -> Any:
+        return node
+
+
+class DeferredFinder(NodeTransformer):  # Whether a body holds code that is only parsed later
+    def __init__(self) -> None:
+        self.found = False
+
+    def visit_DeferredBlock(self, node: Any) -> Any:
+        self.found = True
+        return node
+
+
+def defers(node: Any) -> bool:
+    finder = DeferredFinder()
+    finder.visit(node)
+    return finder.found
+
+
+class Resolver(NodeTransformer):  # Gives each variable a slot address, or marks it global
+    def __init__(self, enclosing: List[FunctionScope] = ()) -> None:
+        self.scopes = list(enclosing)
+        self.deferred = bool(self.scopes)
+
+    def resolve(self, node: Type[IComputable]) -> Type[IComputable]:
+        if self.scopes:  # A deferred body, its frames already exist so new locals can't get slots
+            scope = self.scopes[-1]
+            collector = LocalsCollector()
+            collector.visit(node)
+            scope.global_names |= collector.global_names
+            scope.run_time_names.update(name for name in collector.names if name not in scope.layout)
+        return self.visit(node)
+
+    def address(self, name: str) -> Tuple[Optional[int], Optional[int], bool]:
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name in scope.global_names:
+                break
+            index = scope.layout.get(name)
+            if index is not None:
+                if depth == 0:
+                    if scope.converted and name in scope.assigned:
+                        self.shadow(name)
+                    return (0, index, name in scope.free)
+                if self.scopes[-1].converted:
+                    return (0, self.capture(len(self.scopes) - 1, name), True)
+                return (depth, index, False)
+            if name in scope.run_time_names:
+                return (None, None, False)
+        return (GLOBAL_DEPTH, None, False)
+
+    def reads_outer(self, depth: int) -> None:  # The innermost depth functions need the frames they were made in
+        for scope in self.scopes[len(self.scopes) - depth:]:
+            scope.keeps_parent = True
+
+    def shadowed_depth(self, name: str) -> int:  # Until it's set, a local reads the enclosing variable it shadows
+        for depth, scope in enumerate(reversed(self.scopes[:-1]), 1):
+            if name in scope.global_names:
+                return 0
+            if name in scope.layout or name in scope.run_time_names:
+                return depth
+        return 0
+
+    def capture(self, level: int, name: str) -> int:  # The slot of scopes[level] that holds the cell for name
+        scope = self.scopes[level]
+        index = scope.layout.get(name)
+        if index is not None:
+            if name not in scope.free:
+                scope.cells.add(index)
+            return index
+        index = scope.layout[name] = len(scope.layout)
+        scope.free[name] = index
+        scope.closure_slots.append(self.capture(level - 1, name))
+        return index
+
+    def shadow(self, name: str) -> None:  # Until a closure sets its local, reads see the enclosing variable
+        scope = self.scopes[-1]
+        if outer_name(name) in scope.layout or not self.shadowed_depth(name):
+            return
+        index = scope.layout[outer_name(name)] = len(scope.layout)
+        scope.free[outer_name(name)] = index
+        scope.closure_slots.append(self.capture(len(self.scopes) - 2, name))
+
+    def visit_Variable(self, node: Variable) -> Variable:
+        if node.name == "#kwargs":  # Might be any enclosing function's
+            for scope in self.scopes:
+                scope.reads_kwargs = True
+        node.depth, node.index, node.is_cell = self.address(node.name)
+        if node.depth is None:
+            self.reads_outer(len(self.scopes))
+        elif node.depth > 0:
+            self.reads_outer(node.depth)
+        elif node.depth == 0 and not node.is_cell:  # Might still turn out to be captured
+            self.scopes[-1].variables.setdefault(node.index, []).append(node)
+            if not self.scopes[-1].converted and node.name in self.scopes[-1].assigned:
+                self.reads_outer(self.shadowed_depth(node.name))
+        return node
+
+    def visit_FunctionCreate(self, node: FunctionCreate) -> FunctionCreate:
+        node.default_args = [self.visit(default_arg) for default_arg in node.default_args]
+        layout = function_layout(node.arg_names, node.var_arg_name)
+        deferred = defers(node.operation)  # A body parsed later can't tell us its free names in time
+        converted = (not self.deferred and
+                     (not self.scopes or self.scopes[-1].converted) and
+                     not deferred)
+        scope = FunctionScope(layout, converted, deferred)
+        collector = LocalsCollector()
+        collector.visit(node.operation)
+        scope.global_names = collector.global_names
+        for name in collector.names:
+            if name not in layout and name not in scope.global_names:
+                layout[name] = len(layout)
+                scope.assigned.add(name)
+        node.layout = layout
+        self.scopes.append(scope)
+        node.operation = self.visit(node.operation)
+        self.scopes.pop()
+        for index in scope.cells:
+            for variable in scope.variables.get(index, ()):
+                variable.is_cell = True
+        node.cell_slots = tuple(sorted(scope.cells))
+        node.closure_slots = tuple(scope.closure_slots)
+        node.keeps_parent = scope.keeps_parent
+        node.reads_kwargs = scope.reads_kwargs
+        return node
+
+    def visit_DeferredBlock(self, node: Any) -> Any:
+        node.enclosing = list(self.scopes)
+        self.reads_outer(len(self.scopes))  # The body isn't parsed yet, it might read any enclosing frame
+        return node
@@ -1,4 +1,4 @@
-from .base import IComputable, Object, create_none
+from .base import IComputable, Object, Scope, Completion, RETURN, create_none
 from typing import Type, Iterable
 
 
@@ -10,19 +10,18 @@ class ReturnStatement(IStatement):
     def __init__(self, value: Type[IComputable]):
         self.value = value
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
-        result = self.value.eval(scope_path)
-        result.is_return = True
-        return result
+    def eval(self, scope: Scope) -> Completion:
+        scope.return_value = self.value.eval(scope)
+        return RETURN
 
 
 class ExprStatement(IStatement):
     def __init__(self, expression: Type[IComputable]):
         self.expression = expression
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         if self.expression is not None:
-            return self.expression.eval(scope_path)
+            return self.expression.eval(scope)
         else:
             return create_none()
 
@@ -32,9 +31,9 @@ class StatementList(IStatement):
                  statements: Iterable[Type[IStatement]]) -> None:
         self.statements = statements
 
-    def eval(self, scope_path: tuple) -> Type[Object]:
+    def eval(self, scope: Scope) -> Type[Object]:
         for statement in self.statements:
-            result = statement.eval(scope_path)
-            if result.is_return:
+            result = statement.eval(scope)
+            if type(result) is Completion:
                 return result
         return create_none()
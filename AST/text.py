@@ -1,20 +1,35 @@
 from .base import IPrimitiveType, Class, to_primitive_function
-from .base import register_class, register_function,  Object, Constant
-from .logic import Bool
-from .numerical import Int, Float
-from .exceptions import RaiseStatement, StopIteration
+from .base import register_class, register_function,  Object
+from .logic import create_bool
+from .numerical import Int, Float, create_int
+from .flow_control import NativeIterator
 from typing import Type
 
 
 class String(IPrimitiveType):
+    __slots__ = ("value",)
+
     def __init__(self, value: str = None):
         self.value = value
-        self.iter_current = 0
         super().__init__(string_class)
 
     def __repr__(self):
         return self.value
 
+    def __reduce__(self):
+        return (String, (self.value,))
+
+    def __hash__(self):  # str caches its own hash
+        return hash(self.value)
+
+    def __eq__(self, other):
+        if type(other) is String:
+            return self.value == other.value
+        return NotImplemented
+
+    def __iter__(self):
+        return map(String, self.value)
+
 
 def string_constructor(this: String, arg: Type[Object]):
     this.value = arg.call("#to_string").value
@@ -44,15 +59,15 @@ def string_combine(this: String, other: String) -> String:
 
 
 def string_equal(this: String, other: String):
-    return Bool(this.value == other.value)
+    return create_bool(this.value == other.value)
 
 
 def string_not_equal(this: String, other: String):
-    return Bool(this.value != other.value)
+    return create_bool(this.value != other.value)
 
 
 def string_to_int(this: String) -> Int:
-    return Int(int(this.value))
+    return create_int(int(this.value))
 
 
 def string_to_float(this: String) -> Float:
@@ -64,21 +79,11 @@ def string_to_string(this: String) -> String:
 
 
 def string_hash(this: String) -> Int:
-    return Int(hash(this.value))
-
-
-def string_iter(this: String) -> String:
-    this.iter_current = 0
-    return this
+    return create_int(hash(this.value))
 
 
-def string_next(this: String) -> String:
-    if this.iter_current <= len(this.elements):
-        result = String(this.elements[this.iter_current])
-        this.iter_current += 1
-        return result
-    else:
-        return RaiseStatement(Constant(StopIteration)).exec(())
+def string_iter(this: String) -> NativeIterator:
+    return NativeIterator(map(String, this.value))
 
 
 def static_string_call(this: Class, arg: Type[Object]) -> String:
@@ -97,8 +102,7 @@ string_class = Class("string", {
     "#to_float":        to_primitive_function(string_to_float),
     "#to_string":       to_primitive_function(string_to_string),
     "#hash":            to_primitive_function(string_hash),
-    "#iter":            to_primitive_function(string_iter),
-    "#next":            to_primitive_function(string_next)
+    "#iter":            to_primitive_function(string_iter)
 }, {
     "#call":            to_primitive_function(static_string_call)
 })
@@ -0,0 +1,28 @@
+from .base import IComputable, IAssignable
+from typing import Any
+
+
+class NodeTransformer:
+    def visit(self, node: Any) -> Any:
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is not None:
+            return method(node)
+        return self.generic_visit(node)
+
+    def generic_visit(self, node: Any) -> Any:
+        for name, value in list(vars(node).items()):
+            new_value = self.visit_value(value)
+            if new_value is not value:
+                setattr(node, name, new_value)
+        return node
+
+    def visit_value(self, value: Any) -> Any:
+        if isinstance(value, (IComputable, IAssignable)):
+            return self.visit(value)
+        if type(value) is list:
+            return [self.visit_value(elem) for elem in value]
+        if type(value) is tuple:
+            return tuple(self.visit_value(elem) for elem in value)
+        if type(value) is dict:
+            return {key: self.visit_value(elem) for key, elem in value.items()}
+        return value
@@ -0,0 +1,88 @@
+import os
+import sys
+import pickle
+from hashlib import sha256
+from typing import Optional
+
+from parser import Parser
+from AST.statements import StatementList
+
+
+CACHE_DIR_NAME = "__fcadcache__"
+CACHE_SUFFIX = ".fcadc"
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILES = ["ast_cache.py", "parser.py", "tokenizer.py", "optimizer.py", "vm.py", "closures.py", "transpile.py"]
+
+source_digest: Optional[bytes] = None
+
+
+def source_hash() -> bytes:  # Cached programs are only valid for the interpreter code that made them
+    global source_digest
+    if source_digest is None:
+        digest = sha256()
+        ast_dir = os.path.join(SOURCE_DIR, "AST")
+        paths = ([os.path.join(SOURCE_DIR, name) for name in SOURCE_FILES] +
+                 [os.path.join(ast_dir, name) for name in sorted(os.listdir(ast_dir)) if name.endswith(".py")])
+        for path in paths:
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+        source_digest = digest.digest()
+    return source_digest
+
+
+def options_hash(**options) -> str:
+    return sha256(repr(sorted(options.items())).encode()).hexdigest()[:16]
+
+
+def cache_key(text: str, **options) -> bytes:
+    tag = f"{sys.implementation.cache_tag}:{sys.hexversion}:{sorted(options.items())}\0"
+    return sha256(source_hash() + tag.encode() + text.encode()).digest()
+
+
+def cache_path(path: str, cache_dir: Optional[str] = None, **options) -> str:
+    path = os.path.abspath(path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR_NAME)
+        name = os.path.basename(path)
+    else:  # A shared cache dir needs the full path to tell scripts apart
+        name = sha256(path.encode()).hexdigest()[:16] + '-' + os.path.basename(path)
+    return os.path.join(cache_dir, f"{name}.{options_hash(**options)}{CACHE_SUFFIX}")  # One file per engine and flags
+
+
+def read_cache(path: str, key: bytes) -> Optional[StatementList]:
+    try:
+        with open(path, 'rb') as file:
+            if file.read(len(key)) != key:
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+
+def write_cache(path: str, key: bytes, program: StatementList) -> None:
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as file:
+            file.write(key)
+            pickle.dump(program, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except (OSError, pickle.PicklingError, RecursionError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_program(path: str, *, use_cache=True, cache_dir: Optional[str] = None, **options) -> StatementList:
+    with open(path, 'r') as file:
+        text = file.read().strip()
+
+    if not use_cache:
+        return Parser(text, **options).program()
+
+    key = cache_key(text, **options)
+    location = cache_path(path, cache_dir, **options)
+    program = read_cache(location, key)
+    if program is None:
+        program = Parser(text, **options).program()
+        write_cache(location, key, program)
+    return program
@@ -14,7 +14,10 @@ def type_function(object):
 
 @register_builtin
 def iter_function(iterable):
-    return iterable.call("#iter")
+    result = iterable.call("#iter")
+    if not result.has("#next"):  # A user #iter may hand back a builtin collection, which makes its own iterator
+        return result.call("#iter")
+    return result
 
 
 @register_builtin
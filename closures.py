@@ -0,0 +1,356 @@
+from AST.base import IComputable, Object, Constant, Variable, Assignment, MemberAccess, MemberCall
+from AST.base import FunctionCall, OperatorCall, ParentCall, FunctionCreate, create_none
+from AST.base import call_function, call_member, call_operator, get_member, plain_call, Scope, GLOBAL_DEPTH
+from AST.base import Completion, RETURN, BREAK
+from AST.statements import IStatement, StatementList, ExprStatement, ReturnStatement
+from AST.logic import AndOperation, OrOperation, NotOperation, create_bool, try_bool
+from AST.flow_control import ConditionalStatement, ConditionalExpression, WhileStatement, ForStatement
+from AST.flow_control import ContainsOperation
+from AST.collection_types import ItemAccess
+from AST.visitor import NodeTransformer
+from parser import DeferredBlock
+from typing import Callable, Dict, List, Optional, Type, Any
+
+
+Closure = Callable[[Scope], Type[Object]]
+Store = Callable[[Scope, Type[Object]], None]
+
+
+def compile_node(node: Type[IComputable]) -> Closure:  # The closure is kept on the node, so it's built once
+    closure = vars(node).get("closure")
+    if closure is None:
+        compiler = compilers.get(type(node))
+        closure = compiler(node) if compiler is not None else node.eval
+        node.closure = closure
+    return closure
+
+
+def compile_args(args: List[Type[IComputable]]) -> Callable[[Scope], List[Type[Object]]]:
+    arg_closures = [compile_node(arg) for arg in args]
+    if not arg_closures:
+        return lambda scope: []
+    if len(arg_closures) == 1:
+        arg, = arg_closures
+        return lambda scope: [arg(scope)]
+    if len(arg_closures) == 2:
+        first, second = arg_closures
+        return lambda scope: [first(scope), second(scope)]
+    return lambda scope: [arg(scope) for arg in arg_closures]
+
+
+def compile_store(target: Any) -> Store:
+    if type(target) is Variable and target.depth == 0 and target.is_cell:
+        index = target.index
+
+        def store_cell(scope: Scope, value: Type[Object]) -> None:
+            scope.slots[index].value = value
+        return store_cell
+    if type(target) is Variable and target.depth == 0:
+        index = target.index
+
+        def store_fast(scope: Scope, value: Type[Object]) -> None:
+            scope.slots[index] = value
+        return store_fast
+    if type(target) is Variable and target.depth == GLOBAL_DEPTH:
+        name = target.name
+        global_elements = Variable.table.elements
+
+        def store_global(scope: Scope, value: Type[Object]) -> None:
+            global_elements[name] = value
+        return store_global
+    if type(target) is MemberAccess:
+        obj = compile_node(target.object)
+        name = target.name
+
+        def store_attr(scope: Scope, value: Type[Object]) -> None:
+            obj(scope).set(name, value)
+        return store_attr
+    return target.set_value
+
+
+def compile_Constant(node: Constant) -> Closure:
+    value = node.value
+    return lambda scope: value
+
+
+def compile_Variable(node: Variable) -> Closure:
+    name = node.name
+    if node.depth == 0 and node.is_cell:
+        index = node.index
+
+        def load_cell(scope: Scope) -> Type[Object]:
+            result = scope.slots[index].value
+            if result is None:
+                result = scope.load(0, index, name)
+                if result is None:
+                    raise IndexError(f"Name {name} could not be resolved")
+            return result
+        return load_cell
+    if node.depth == 0:
+        index = node.index
+
+        def load_fast(scope: Scope) -> Type[Object]:
+            result = scope.slots[index]
+            if result is None:
+                result = scope.load(0, index, name)
+                if result is None:
+                    raise IndexError(f"Name {name} could not be resolved")
+            return result
+        return load_fast
+    if node.depth == GLOBAL_DEPTH:
+        global_elements = Variable.table.elements
+
+        def load_global(scope: Scope) -> Type[Object]:
+            result = global_elements.get(name)
+            if result is None:
+                raise IndexError(f"Name {name} could not be resolved")
+            return result
+        return load_global
+    return node.eval
+
+
+def compile_Assignment(node: Assignment) -> Closure:
+    value = compile_node(node.value)
+    store = compile_store(node.object)
+
+    def assignment(scope: Scope) -> Type[Object]:
+        result = value(scope)
+        store(scope, result)
+        return result
+    return assignment
+
+
+def compile_MemberAccess(node: MemberAccess) -> Closure:
+    obj = compile_node(node.object)
+    name = node.name
+    cache = node.cache
+    return lambda scope: cache.lookup(obj(scope), name)
+
+
+def compile_MemberCall(node: MemberCall) -> Closure:
+    if not plain_call(node):
+        return node.eval
+    obj = compile_node(node.object)
+    name = node.name
+    args = compile_args(node.args)
+    cache = node.cache
+
+    def member_call(scope: Scope) -> Type[Object]:
+        this = obj(scope)
+        return call_member(this, get_member(this, name, cache=cache), args(scope), None)
+    return member_call
+
+
+def compile_ParentCall(node: ParentCall) -> Closure:
+    if not plain_call(node):
+        return node.eval
+    this = compile_node(node.this)
+    name = node.name
+    args = compile_args(node.args)
+    cache = node.cache
+
+    def parent_call(scope: Scope) -> Type[Object]:
+        obj = this(scope)
+        return call_member(obj, get_member(obj, name, use_parent=True, cache=cache), args(scope), None)
+    return parent_call
+
+
+def compile_ItemAccess(node: ItemAccess) -> Closure:
+    if node.spread:
+        return node.eval
+    obj = compile_node(node.iterable)
+    args = compile_args(node.arguments)
+    cache = node.get_cache
+
+    def item_access(scope: Scope) -> Type[Object]:
+        this = obj(scope)
+        return call_member(this, get_member(this, "#get_item", cache=cache), args(scope), None)
+    return item_access
+
+
+def compile_FunctionCall(node: FunctionCall) -> Closure:
+    if not plain_call(node):
+        return node.eval
+    function = compile_node(node.function)
+    args = compile_args(node.args)
+    return lambda scope: call_function(function(scope), args(scope), None)
+
+
+def compile_OperatorCall(node: OperatorCall) -> Closure:
+    name = node.name
+    args = compile_args(node.arguments)
+    return lambda scope: call_operator(name, args(scope))
+
+
+def compile_AndOperation(node: AndOperation) -> Closure:
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+
+    def and_operation(scope: Scope) -> Type[Object]:
+        left_obj = left(scope)
+        if not try_bool(left_obj).value:
+            return left_obj
+        return right(scope)
+    return and_operation
+
+
+def compile_OrOperation(node: OrOperation) -> Closure:
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+
+    def or_operation(scope: Scope) -> Type[Object]:
+        left_obj = left(scope)
+        if try_bool(left_obj).value:
+            return left_obj
+        return right(scope)
+    return or_operation
+
+
+def compile_NotOperation(node: NotOperation) -> Closure:
+    value = compile_node(node.value)
+    return lambda scope: create_bool(not try_bool(value(scope)).value)
+
+
+def compile_ConditionalExpression(node: ConditionalExpression) -> Closure:
+    condition = compile_node(node.condition)
+    if_expr = compile_node(node.if_expr) if node.if_expr is not None else None
+    else_expr = compile_node(node.else_expr)
+
+    def conditional_expression(scope: Scope) -> Type[Object]:
+        result = condition(scope)
+        if try_bool(result).value:
+            return if_expr(scope) if if_expr is not None else result
+        return else_expr(scope)
+    return conditional_expression
+
+
+def compile_ExprStatement(node: ExprStatement) -> Closure:
+    if node.expression is None:
+        return lambda scope: create_none()
+    return compile_node(node.expression)
+
+
+def compile_ReturnStatement(node: ReturnStatement) -> Closure:
+    value = compile_node(node.value)
+
+    def return_statement(scope: Scope) -> Completion:
+        scope.return_value = value(scope)
+        return RETURN
+    return return_statement
+
+
+def compile_StatementList(node: StatementList) -> Closure:
+    statements = [compile_node(statement) for statement in node.statements]
+
+    def statement_list(scope: Scope) -> Type[Object]:
+        for statement in statements:
+            result = statement(scope)
+            if type(result) is Completion:
+                return result
+        return create_none()
+    return statement_list
+
+
+def compile_ConditionalStatement(node: ConditionalStatement) -> Closure:
+    condition = compile_node(node.condition)
+    if_body = compile_node(node.if_body)
+    else_body = compile_node(node.else_body) if node.else_body is not None else None
+
+    def conditional_statement(scope: Scope) -> Optional[Type[Object]]:
+        if try_bool(condition(scope)).value:
+            return if_body(scope)
+        elif else_body is not None:
+            return else_body(scope)
+    return conditional_statement
+
+
+def compile_WhileStatement(node: WhileStatement) -> Closure:
+    condition = compile_node(node.condition)
+    body = compile_node(node.body)
+
+    def while_statement(scope: Scope) -> Type[Object]:
+        while try_bool(condition(scope)).value:
+            result = body(scope)
+            if result is BREAK:
+                break
+            if result is RETURN:
+                return result
+        return create_none()
+    return while_statement
+
+
+def compile_ForStatement(node: ForStatement) -> Closure:
+    if not isinstance(node.head, ContainsOperation):
+        return node.eval
+    iterable = compile_node(node.head.iterable)
+    store = compile_store(node.head.value)
+    body = compile_node(node.body)
+
+    def for_statement(scope: Scope) -> Type[Object]:
+        for value in iterable(scope):
+            try:
+                store(scope, value)
+            except StopIteration:
+                break
+            result = body(scope)
+            if result is BREAK:
+                break
+            if result is RETURN:
+                return result
+        return create_none()
+    return for_statement
+
+
+def compile_ClosureBlock(node: "ClosureBlock") -> Closure:
+    return compile_node(node.node)
+
+
+compilers: Dict[type, Callable[[Any], Closure]] = {
+    Constant:               compile_Constant,
+    Variable:               compile_Variable,
+    Assignment:             compile_Assignment,
+    MemberAccess:           compile_MemberAccess,
+    MemberCall:             compile_MemberCall,
+    ParentCall:             compile_ParentCall,
+    ItemAccess:             compile_ItemAccess,
+    FunctionCall:           compile_FunctionCall,
+    OperatorCall:           compile_OperatorCall,
+    AndOperation:           compile_AndOperation,
+    OrOperation:            compile_OrOperation,
+    NotOperation:           compile_NotOperation,
+    ConditionalExpression:  compile_ConditionalExpression,
+    ExprStatement:          compile_ExprStatement,
+    ReturnStatement:        compile_ReturnStatement,
+    StatementList:          compile_StatementList,
+    ConditionalStatement:   compile_ConditionalStatement,
+    WhileStatement:         compile_WhileStatement,
+    ForStatement:           compile_ForStatement
+}
+
+
+class ClosureBlock(IStatement):  # eval on the wrapped node stays the reference semantics
+    def __init__(self, node: Type[IComputable]) -> None:
+        self.node = node
+
+    def eval(self, scope: Scope) -> Type[Object]:
+        return compile_node(self)(scope)
+
+
+compilers[ClosureBlock] = compile_ClosureBlock
+
+
+class ClosureCompiler(NodeTransformer):
+    def __call__(self, node: Type[IComputable]) -> ClosureBlock:
+        return ClosureBlock(self.visit(node))
+
+    def __repr__(self) -> str:
+        return "ClosureCompiler()"
+
+    def visit_FunctionCreate(self, node: FunctionCreate) -> FunctionCreate:
+        self.generic_visit(node)
+        if type(node.operation) is not DeferredBlock:  # Deferred bodies get compiled once parsed
+            node.operation = ClosureBlock(node.operation)
+        return node
+
+    def visit_DeferredBlock(self, node: DeferredBlock) -> DeferredBlock:
+        return node
@@ -0,0 +1,95 @@
+from AST.base import Constant, OperatorCall, IComputable, Variable
+from AST.statements import ExprStatement
+from AST.logic import NotOperation, AndOperation, OrOperation, Bool, try_bool
+from AST.flow_control import ConditionalStatement, ConditionalExpression, WhileStatement
+from AST.numerical import Int, Float
+from AST.text import String
+from AST.visitor import NodeTransformer
+from typing import Optional, Type
+
+
+folding_types = (Int, Float, String, Bool)
+
+
+def is_constant(node: Type[IComputable]) -> bool:
+    return type(node) is Constant and type(node.value) in folding_types
+
+
+def fold(node: Type[IComputable]) -> Type[IComputable]:
+    try:
+        result = node.eval(Variable.table)
+    except Exception:  # Leave the error to be raised at run time
+        return node
+    if type(result) in folding_types:
+        return Constant(result)
+    return node
+
+
+def constant_truth(node: Type[IComputable]) -> Optional[bool]:
+    if not is_constant(node):
+        return None
+    try:
+        return bool(try_bool(node.value).value)
+    except Exception:
+        return None
+
+
+class Optimizer(NodeTransformer):  # Level 1 folds constants, level 2 also drops dead branches
+    def __init__(self, level: int = 1) -> None:
+        self.level = level
+
+    def __call__(self, node: Type[IComputable]) -> Type[IComputable]:
+        return self.visit(node)
+
+    def __repr__(self) -> str:
+        return f"Optimizer({self.level})"
+
+    def visit_OperatorCall(self, node: OperatorCall) -> Type[IComputable]:
+        self.generic_visit(node)
+        if all(is_constant(arg) for arg in node.arguments):
+            return fold(node)
+        return node
+
+    def visit_NotOperation(self, node: NotOperation) -> Type[IComputable]:
+        self.generic_visit(node)
+        if is_constant(node.value):
+            return fold(node)
+        return node
+
+    def visit_AndOperation(self, node: AndOperation) -> Type[IComputable]:
+        self.generic_visit(node)
+        truth = constant_truth(node.left)
+        if truth is None:
+            return node
+        return node.right if truth else node.left
+
+    def visit_OrOperation(self, node: OrOperation) -> Type[IComputable]:
+        self.generic_visit(node)
+        truth = constant_truth(node.left)
+        if truth is None:
+            return node
+        return node.left if truth else node.right
+
+    def visit_ConditionalExpression(self, node: ConditionalExpression) -> Type[IComputable]:
+        self.generic_visit(node)
+        truth = constant_truth(node.condition) if self.level >= 2 else None
+        if truth is None:
+            return node
+        if truth:
+            return node.if_expr if node.if_expr is not None else node.condition
+        return node.else_expr
+
+    def visit_ConditionalStatement(self, node: ConditionalStatement) -> Type[IComputable]:
+        self.generic_visit(node)
+        truth = constant_truth(node.condition) if self.level >= 2 else None
+        if truth is None:
+            return node
+        if truth:
+            return node.if_body
+        return node.else_body if node.else_body is not None else ExprStatement(None)
+
+    def visit_WhileStatement(self, node: WhileStatement) -> Type[IComputable]:
+        self.generic_visit(node)
+        if self.level >= 2 and constant_truth(node.condition) is False:
+            return ExprStatement(None)
+        return node
@@ -1,18 +1,20 @@
 from AST.base import ClassCreate, FunctionCreate, Assignment, Variable, MemberCall
 from AST.base import IAssignable, FunctionCall, OperatorCall, MemberAccess, ParentCall
-from AST.base import ConstructorCall, UnpackOperation, Constant, Destructuring
-from AST.statements import StatementList, ExprStatement, ReturnStatement
+from AST.base import ConstructorCall, UnpackOperation, Constant, Destructuring, create_none, Scope
+from AST.base import Completion, RETURN
+from AST.statements import StatementList, ExprStatement, ReturnStatement, IStatement
 from AST.exceptions import RaiseStatement
 from AST.logic import NotOperation, OrOperation, AndOperation
 from AST.flow_control import BreakStatement, ContinueStatement, ConditionalExpression
 from AST.flow_control import ConditionalStatement, WhileStatement, ForStatement
 from AST.flow_control import ListComprehensionConstant, ContainsOperation
-from AST.numerical import Int, Float
+from AST.numerical import Float, create_int
 from AST.collection_types import ItemAccess, TupleConstant, ArrayConstant, DictionaryConstant
 from AST.text import String
-from typing import Any
+from AST.resolver import Resolver, FunctionScope
+from typing import Any, List, Optional
 
-from tokenizer import Tokenizer, TokenType
+from tokenizer import Tokenizer, TokenType, TokenStream
 import builtin_functions
 
 
@@ -36,24 +38,63 @@ class Parser:
         '^':    "#exponent"
     }
 
-    def __init__(self, text):
-        self.tokens = Tokenizer(text).get_token_list()
+    operator_code = TokenType.OPERATOR.value
+    keyword_code = TokenType.KEYWORD.value
+    group_code = TokenType.GROUP.value
+    dot_code = TokenType.DOT.value
+    question_code = TokenType.QUESTION.value
+
+    not_precedence = 3
+    comparation_precedence = 5
+
+    binary_precedence = {
+        'or':   1,
+        'and':  2,
+        'in':   4,
+        '==':   5,
+        '!=':   5,
+        '<':    5,
+        '<=':   5,
+        '>':    5,
+        '>=':   5,
+        '+':    6,
+        '-':    6,
+        '*':    7,
+        '/':    7,
+        '%':    7,
+        '^':    8
+    }
+
+    def __init__(self, source, *, line=1, column=1, lazy_bodies=False, transforms=()):
+        self.tokens = TokenStream(Tokenizer(source, line, column))
         self.pos = 0
+        self.lazy_bodies = lazy_bodies
+        self.transforms = transforms
+
+    def transform(self, node, enclosing: List[FunctionScope] = ()):  # Resolves names, then runs the passes
+        node = Resolver(enclosing).resolve(node)
+        for transform in self.transforms:
+            node = transform(node)
+        return node
 
     def error(self, message=""):
-        raise SyntaxError(f"On {self.token} at pos {self.pos}:\n\t{message}")
+        token = self.token
+        line, column = self.tokens.tokenizer.location(token.start)
+        raise SyntaxError(f"On {token} at line {line}, column {column}:\n\t{message}")
 
     @property
     def token(self):
-        if self.pos < len(self.tokens):
-            return self.tokens[self.pos]
+        token = self.tokens[self.pos]
+        if token is not None:
+            return token
         self.pos -= 1
         self.error("Unexpected EOF")
 
     @property
     def next_token(self):
-        if self.pos < len(self.tokens) - 1:
-            return self.tokens[self.pos + 1]
+        token = self.tokens[self.pos + 1]
+        if token is not None:
+            return token
         self.error("Unexpected EOF")
 
     @property
@@ -63,12 +104,14 @@ class Parser:
         self.error("Expected previous token")
 
     def eat(self, type: TokenType, value: Any = None):
-        if self.token.type != type or (value is not None and self.token.value != value):
+        pos = self.pos
+        if (self.tokens.type_at(pos) != type.value or
+           value is not None and self.tokens.value_at(pos) != value):
             self.error(f"Expected {type}" + (f" of value {value}" if value is not None else ""))
-        else:
-            value = self.token.value
-            self.pos += 1
-            return value
+        value = self.tokens.value_at(pos)
+        self.pos = pos + 1
+        self.tokens.release(pos)
+        return value
 
     def find_next(self, type: TokenType):
         start_pos = self.pos
@@ -86,6 +129,29 @@ class Parser:
         self.eat(TokenType.GROUP, '}')
         return result
 
+    def function_body(self):
+        if not self.lazy_bodies or self.token.type != TokenType.GROUP or self.token.value != '{':
+            return self.statement_block()
+        start = self.token.start
+        depth = 0
+        while True:  # Only match brackets, the body gets parsed on its first call
+            type = self.tokens.type_at(self.pos)
+            if type == TokenType.GROUP.value:
+                value = self.tokens.value_at(self.pos)
+                if value == '{':
+                    depth += 1
+                elif value == '}':
+                    depth -= 1
+            elif type == TokenType.EOF.value:
+                self.error("Unexpected EOF")
+            self.pos += 1
+            if depth == 0:
+                break
+        tokenizer = self.tokens.tokenizer
+        line, column = tokenizer.location(start)
+        return DeferredBlock(tokenizer.slice(start, self.prev_token.end), line, column,
+                             lazy_bodies=True, transforms=self.transforms)
+
     def statement_list(self):
         s = self.statement()
         result = [s] if s is not None else []
@@ -95,6 +161,15 @@ class Parser:
                 result.append(s)
         return StatementList(result)
 
+    def program(self):
+        return self.transform(self.statement_list())
+
+    def statements(self):
+        while self.token.type != TokenType.EOF:
+            s = self.statement()
+            if s is not None:
+                yield self.transform(s)
+
     def statement(self):
         return self.class_statement()
 
@@ -155,7 +230,7 @@ class Parser:
             else:
                 names = []
             self.eat(TokenType.GROUP, ')')
-            body = self.statement_block()
+            body = self.function_body()
             return Assignment(Variable(name),
                               FunctionCreate(body,
                                              names,
@@ -223,103 +298,65 @@ class Parser:
         return result
 
     def expr(self):
-        return self.assignment_expr()
-
-    def assignment_expr(self):
-        var = self.list_comp_expr()
-        if self.token.value == '=':
-            assert(isinstance(var, IAssignable))
-            self.eat(TokenType.OPERATOR)
-            expr = self.assignment_expr()
-            return Assignment(var, expr)
-        return var
-
-    def list_comp_expr(self):
-        operation = self.conditional_expr()
-        if self.token.value == "for":
+        value = self.binary_expr(0)
+        if self.tokens.type_at(self.pos) == Parser.question_code:
+            self.eat(TokenType.QUESTION)
+            if_expr = self.expr()
+            self.eat(TokenType.COLON)
+            else_expr = self.expr()
+            value = ConditionalExpression(value, if_expr, else_expr)
+        if self.tokens.value_at(self.pos) == "for":
             self.eat(TokenType.KEYWORD)
             head = self.expr()
             if self.token.type == TokenType.COMMA:
                 conditions = self.expr_list()
             else:
                 conditions = []
-            return ListComprehensionConstant(head, operation, conditions)
-        return operation
-
-    def conditional_expr(self):
-        condition = self.or_expr()
-        if self.token.type == TokenType.QUESTION:
-            self.eat(TokenType.QUESTION)
-            if_expr = self.expr()
-            self.eat(TokenType.COLON)
-            else_expr = self.expr()
-            return ConditionalExpression(condition, if_expr, else_expr)
-        return condition
-
-    def or_expr(self):
-        value = self.and_expr()
-        while self.token.value == "or":
-            self.eat(TokenType.OPERATOR)
-            value = OrOperation(value, self.and_expr())
-        return value
-
-    def and_expr(self):
-        value = self.not_expr()
-        while self.token.value == "and":
-            self.eat(TokenType.OPERATOR)
-            value = AndOperation(value, self.not_expr())
-        return value
-
-    def not_expr(self):
-        if self.token.value == "not":
-            self.eat(TokenType.OPERATOR)
-            return NotOperation(self.not_expr())
-        return self.in_expr()
-
-    def in_expr(self):
-        value = self.comparation_expr()
-        if self.token.value == "in":
-            self.eat(TokenType.KEYWORD)
-            return ContainsOperation(value, self.expr())
-        return value
-
-    def comparation_expr(self):
-        value = self.term_expr()
-        if self.token.value in Parser.comparation_operators:
-            operator = self.token.value
+            value = ListComprehensionConstant(head, value, conditions)
+        if self.tokens.value_at(self.pos) == '=':
+            assert(isinstance(value, IAssignable))
             self.eat(TokenType.OPERATOR)
-            last_operand = self.term_expr()
-            value = OperatorCall(Parser.operator_names[operator], [value, last_operand])
-            while self.token.value in Parser.comparation_operators:  # Allows a < x < b
-                operator = self.token.value
-                self.eat(TokenType.OPERATOR)
-                op = self.term_expr()
-                value = AndOperation(value, OperatorCall(Parser.operator_names[operator], [last_operand, op]))
-                last_operand = op
+            return Assignment(value, self.expr())
         return value
 
-    def term_expr(self):
-        value = self.factor_expr()
-        while self.token.value in ('+', '-'):
-            operator = self.token.value
+    def binary_expr(self, min_precedence):
+        tokens = self.tokens
+        if (min_precedence <= Parser.not_precedence and
+           tokens.type_at(self.pos) == Parser.operator_code and
+           tokens.value_at(self.pos) == "not"):
             self.eat(TokenType.OPERATOR)
-            value = OperatorCall(Parser.operator_names[operator], [value, self.factor_expr()])
-        return value
-
-    def factor_expr(self):
-        value = self.power_expr()
-        while self.token.value in ('*', '/', '%'):
-            operator = self.token.value
-            self.eat(TokenType.OPERATOR)
-            value = OperatorCall(Parser.operator_names[operator], [value, self.power_expr()])
-        return value
+            value = NotOperation(self.binary_expr(Parser.not_precedence))
+        else:
+            value = self.trailer_expr()
 
-    def power_expr(self):
-        value = self.trailer_expr()
-        while self.token.value == '^':
-            self.eat(TokenType.OPERATOR)
-            value = OperatorCall("#exponent", [value, self.trailer_expr()])
-        return value
+        while True:
+            type = tokens.type_at(self.pos)
+            if type != Parser.operator_code and type != Parser.keyword_code:
+                return value
+            operator = tokens.value_at(self.pos)
+            precedence = Parser.binary_precedence.get(operator, -1)
+            if precedence < min_precedence:
+                return value
+            self.pos += 1
+            tokens.release(self.pos - 1)
+
+            if operator == "in":  # The container takes the whole remaining expression
+                return ContainsOperation(value, self.expr())
+            if operator == "or":
+                value = OrOperation(value, self.binary_expr(precedence + 1))
+            elif operator == "and":
+                value = AndOperation(value, self.binary_expr(precedence + 1))
+            elif precedence == Parser.comparation_precedence:
+                last_operand = self.binary_expr(precedence + 1)
+                value = OperatorCall(Parser.operator_names[operator], [value, last_operand])
+                while (tokens.type_at(self.pos) == Parser.operator_code and
+                       tokens.value_at(self.pos) in Parser.comparation_operators):  # Allows a < x < b
+                    operator = self.eat(TokenType.OPERATOR)
+                    op = self.binary_expr(precedence + 1)
+                    value = AndOperation(value, OperatorCall(Parser.operator_names[operator], [last_operand, op]))
+                    last_operand = op
+            else:
+                value = OperatorCall(Parser.operator_names[operator], [value, self.binary_expr(precedence + 1)])
 
     def expr_list(self, *, with_kwargs=False):
         start_symbol = self.token.value
@@ -350,11 +387,13 @@ class Parser:
                 start_symbol = self.token.value
                 result.append(self.expr())
 
-        return result if not with_kwargs else (result, DictionaryConstant(kwarg_lines))
+        return result if not with_kwargs else (result, DictionaryConstant(kwarg_lines) if kwarg_lines else None)
 
     def trailer_expr(self):
         value = self.atom()
-        while self.token.value in ('(', '[') or self.token.type == TokenType.DOT:
+        tokens = self.tokens
+        while (tokens.type_at(self.pos) == Parser.dot_code or
+               tokens.type_at(self.pos) == Parser.group_code and tokens.value_at(self.pos) in ('(', '[')):
             if self.token.type == TokenType.DOT:
                 self.eat(TokenType.DOT)
                 value = MemberAccess(value, self.eat(TokenType.NAME))
@@ -387,7 +426,7 @@ class Parser:
         if token.type == TokenType.KEYWORD:
             if token.value == "null":
                 self.eat(TokenType.KEYWORD)
-                return ConstructorCall(Variable("NoneType"), [])
+                return Constant(create_none())
             if token.value == "parent":
                 self.eat(TokenType.KEYWORD)
                 self.eat(TokenType.DOT)
@@ -399,7 +438,7 @@ class Parser:
 
         if token.type == TokenType.INT:
             self.eat(TokenType.INT)
-            return Constant(Int(token.value))
+            return Constant(create_int(token.value))
 
         if token.type == TokenType.FLOAT:
             self.eat(TokenType.FLOAT)
@@ -426,7 +465,7 @@ class Parser:
                         names = [value.name]
                     elif all([isinstance(val, Variable) for val in value.arguments]):
                         names = [val.name for val in value.arguments]
-                    return FunctionCreate(self.statement_block(), names)
+                    return FunctionCreate(self.function_body(), names)
                 return value
 
             if token.value == '[':
@@ -469,13 +508,46 @@ class Parser:
         return None
 
 
+class DeferredBlock(IStatement):
+    def __init__(self, text: str, line: int, column: int, **options) -> None:
+        self.text = text
+        self.line = line
+        self.column = column
+        self.options = options
+        self.block: Optional[IStatement] = None
+        self.enclosing: List[FunctionScope] = []  # Set by the resolver
+
+    def parse(self) -> IStatement:
+        if self.block is None:
+            parser = Parser(self.text, line=self.line, column=self.column, **self.options)
+            self.block = parser.transform(parser.statement_block(), self.enclosing)
+            self.text = None
+            self.enclosing = None
+        return self.block
+
+    def eval(self, scope: Scope):
+        return self.parse().eval(scope)
+
+
 def parse_expr(text):
-    return Parser(text).expr().eval(())
+    return Parser(text).expr().eval(Variable.table)
 
 
 def parse_statement(text):
-    return Parser(text).statement().eval(())
+    result = Parser(text).statement().eval(Variable.table)
+    if result is RETURN:
+        return Variable.table.return_value
+    if result is None or type(result) is Completion:
+        return create_none()
+    return result
 
 
 def parse_program(text):
-    return Parser(text).statement_list().eval(())
+    return Parser(text).statement_list().eval(Variable.table)
+
+
+def stream_program(source, **options):
+    for statement in Parser(source, **options).statements():
+        if statement.eval(Variable.table) is RETURN:
+            return Variable.table.return_value
+    return create_none()
@@ -1,6 +1,8 @@
 import re
+from sys import intern
+from array import array
 from enum import Enum
-from typing import TypeVar, List
+from typing import TypeVar, List, Iterator, Optional, Tuple, Union, TextIO
 
 
 class TokenType(Enum):
@@ -24,12 +26,19 @@ class TokenType(Enum):
 
 
 TokenValue = TypeVar("TokenValue", int, float, str)
+TokenTuple = Tuple[int, TokenValue, int, int]
+
+token_types = tuple(TokenType)
 
 
 class Token:
-    def __init__(self, type: TokenType, value: TokenValue) -> None:
+    __slots__ = ("type", "value", "start", "end")
+
+    def __init__(self, type: TokenType, value: TokenValue, start: int = -1, end: int = -1) -> None:
         self.type = type
         self.value = value
+        self.start = start
+        self.end = end
 
     def __eq__(self, other):
         return self.type == other.type and self.value == other.value
@@ -38,9 +47,21 @@ class Token:
         return f"Token({str(self.type)}, {str(self.value)})"
 
 
-int_regex = re.compile(r"^(\+|-)?[0-9]+")
-float_regex = re.compile(r"^(\+|-)?[0-9]*\.[0-9]+")
-name_regex = re.compile(r"^[\#A-Za-z_][A-Za-z_0-9]*")
+token_regex = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<string>")
+  | (?P<float>(?:\+|-)?[0-9]*\.[0-9]+)
+  | (?P<int>(?:\+|-)?[0-9]+)
+  | (?P<name>[\#A-Za-z_][A-Za-z_0-9]*)
+  | (?P<arrow>=>)
+  | (?P<ellipsis>\.\.\.)
+  | (?P<range>\.\.)
+  | (?P<operator>[<>!=+\-*/%]=|\+\+|[+\-*/^%<>=!])
+  | (?P<group>[()\[\]{}])
+  | (?P<special>[,;.:?|])
+""", re.VERBOSE)
+string_regex = re.compile(r'"((?:[^"\\]|\\.)*)"', re.DOTALL)
+escape_regex = re.compile(r"\\(.)", re.DOTALL)
 
 
 class Tokenizer:
@@ -111,119 +132,216 @@ class Tokenizer:
         'v': '\v'
     }
 
-    def __init__(self, input: str) -> None:
-        self.text = input + '\0'
-        self.pos = 0
-
-    @property
-    def char(self) -> str:
-        return self.text[self.pos]
-
-    @property
-    def next_char(self) -> str:
-        return self.text[self.pos + 1]
+    keyword_set = frozenset(keywords)
+    named_operator_set = frozenset(named_operators)
 
-    def advance(self, amount: int = 1) -> None:
-        self.pos += amount
+    token_types = {
+        "arrow":    TokenType.ARROW.value,
+        "ellipsis": TokenType.ELLIPSIS.value,
+        "range":    TokenType.OPERATOR.value,
+        "operator": TokenType.OPERATOR.value,
+        "group":    TokenType.GROUP.value
+    }
 
-    def skip_whitespace(self) -> None:
-        while self.char != '\0' and self.char.isspace():
-            self.advance()
+    special_types = {char: type.value for char, type in special_chars.items()}
+
+    chunk_size = 1 << 16
+    lookahead = 2  # Characters the master regex may inspect past the end of a token
+
+    def __init__(self, input: Union[str, TextIO], line: int = 1, column: int = 1) -> None:
+        if isinstance(input, str):
+            self.text = input
+            self.source = None
+        else:
+            self.text = ""
+            self.source = input
+        self.base = 0  # Source offset of self.text[0], which is at line and column
+        self.line = line
+        self.column = column
+        self.keep: Optional[int] = None  # Source offset the buffer must be kept from
+        self.pos = 0
+        self.end = self.text.find('\0')
+        if self.end == -1:
+            self.end = len(self.text)
+        self.scanner = self.scan()
+
+    def read(self) -> bool:
+        if self.source is None:
+            return False
+        chunk = self.source.read(Tokenizer.chunk_size)
+        if not chunk:
+            self.source = None
+            return False
+        drop = self.pos if self.keep is None else min(self.pos, self.keep - self.base)
+        self.line, self.column = self.location(self.base + drop)
+        self.text = self.text[drop:self.end] + chunk
+        self.base += drop
+        self.pos -= drop
+        self.end = self.text.find('\0', len(self.text) - len(chunk))
+        if self.end == -1:
+            self.end = len(self.text)
+        else:
+            self.source = None
+        return True
+
+    def location(self, offset: int) -> Tuple[int, int]:
+        offset = max(offset - self.base, 0)
+        newlines = self.text.count('\n', 0, offset)
+        if newlines == 0:
+            return (self.line, self.column + offset)
+        return (self.line + newlines, offset - self.text.rfind('\n', 0, offset))
+
+    def slice(self, start: int, end: int) -> str:
+        return self.text[start - self.base:end - self.base]
+
+    def error(self, message: str, offset: int):
+        line, column = self.location(offset)
+        raise SyntaxError(f"{message} at line {line}, column {column}")
 
     def get_string(self) -> str:
-        result = ""
-        self.advance()
+        start = self.base + self.pos  # Reading more of the stream moves base and pos
+        match = string_regex.match(self.text, self.pos, self.end)
+        while match is None and self.read():
+            match = string_regex.match(self.text, self.pos, self.end)
+        if match is None:
+            self.error("Unterminated string", start)
+        self.pos = match.end()
+        value = match.group(1)
+        if '\\' in value:
+            return escape_regex.sub(Tokenizer.unescape, value)
+        return value
+
+    @staticmethod
+    def unescape(match: re.Match) -> str:
+        char = match.group(1)
+        if char not in Tokenizer.escape_chars:
+            raise SyntaxError(f"Unrecognized escape sequence: '\\{char}'")
+        return Tokenizer.escape_chars[char]
+
+    def scan(self) -> Iterator[TokenTuple]:
+        match_token = token_regex.match
+        keywords = Tokenizer.keyword_set
+        named_operators = Tokenizer.named_operator_set
+        types = Tokenizer.token_types
+        special_types = Tokenizer.special_types
+        while self.pos < self.end or self.read():
+            start = self.pos
+            match = match_token(self.text, start, self.end)
+            if (self.source is not None and
+               (match is None or match.end() + Tokenizer.lookahead > self.end) and
+               self.read()):
+                continue  # The token might continue in the next chunk
+            if match is None:
+                self.error(f"Unrecognized character: '{self.text[start]}'", self.base + start)
+
+            kind = match.lastgroup
+            if kind == "string":
+                start += self.base  # get_string may read on, which rebases self.pos
+                value = intern(self.get_string())
+                yield (TokenType.STRING.value, value, start, self.base + self.pos)
+                continue
 
-        while self.char != '\"':
-            if self.char == '\\':
-                self.advance()
-                result += Tokenizer.escape_chars[self.char]
+            self.pos = match.end()
+            if kind == "space":
+                continue
+            value = match.group()
+            start += self.base
+            if kind == "name":
+                value = intern(value)
+                if value in keywords:
+                    yield (TokenType.KEYWORD.value, value, start, self.base + self.pos)
+                elif value in named_operators:
+                    yield (TokenType.OPERATOR.value, value, start, self.base + self.pos)
+                else:
+                    yield (TokenType.NAME.value, value, start, self.base + self.pos)
+            elif kind == "int":
+                yield (TokenType.INT.value, int(value), start, self.base + self.pos)
+            elif kind == "float":
+                yield (TokenType.FLOAT.value, float(value), start, self.base + self.pos)
+            elif kind == "special":
+                yield (special_types[value], intern(value), start, self.base + self.pos)
             else:
-                result += self.char
-            self.advance()
-        self.advance()
+                yield (types[kind], intern(value), start, self.base + self.pos)
 
-        return result
+        end = self.base + self.end
+        while True:
+            yield (TokenType.EOF.value, '\0', end, end)
 
     def get_next_token(self) -> Token:
-        while self.char != '\0':
+        type, value, start, end = next(self.scanner)
+        return Token(token_types[type], value, start, end)
 
-            if self.char.isspace():
-                self.skip_whitespace()
-                continue
-
-            if self.char == '"':
-                return Token(TokenType.STRING, self.get_string())
-
-            match = float_regex.match(self.text[self.pos:])
-            if match is not None:
-                start, end = match.span()
-                assert(start == 0)
-                result = Token(TokenType.FLOAT,
-                               float(self.text[self.pos: self.pos + end]))
-                self.advance(end)
-                return result
-
-            match = int_regex.match(self.text[self.pos:])
-            if match is not None:
-                start, end = match.span()
-                result = Token(TokenType.INT,
-                               int(self.text[self.pos:self.pos + end]))
-                self.advance(end)
-                return result
-
-            match = name_regex.match(self.text[self.pos:])
-            if match is not None:
-                start, end = match.span()
-                result = Token(TokenType.NAME,
-                               self.text[self.pos:self.pos + end])
-                if result.value in Tokenizer.keywords:
-                    result.type = TokenType.KEYWORD
-                elif result.value in Tokenizer.named_operators:
-                    result.type = TokenType.OPERATOR
-                self.advance(end)
-                return result
-
-            if self.char == '=' and self.next_char == '>':
-                self.advance(2)
-                return Token(TokenType.ARROW, '=>')
-
-            if self.char == self.next_char == self.text[self.pos + 2] == '.':
-                self.advance(3)
-                return Token(TokenType.ELLIPSIS, '...')
-
-            if self.char == self.next_char == '.':
-                self.advance(2)
-                return Token(TokenType.OPERATOR, '..')
-
-            if self.char in Tokenizer.operator_chars:
-                result = Token(TokenType.OPERATOR, self.char)
-                if(self.char in ('<', '>', '!', '=', '+', '-', '*', '/', '%') and self.next_char == '=' or
-                   self.char in ('+',) and self.next_char == self.char):
-                    result.value += self.next_char
-                    self.advance()
-                self.advance()
-                return result
-
-            if self.char in Tokenizer.group_chars:
-                result = Token(TokenType.GROUP, self.char)
-                self.advance()
-                return result
-
-            if self.char in Tokenizer.special_chars.keys():
-                result = Token(Tokenizer.special_chars[self.char], self.char)
-                self.advance()
-                return result
-
-            raise SyntaxError(f"Unrecognized character: '{self.char}'")
-
-        return Token(TokenType.EOF, '\0')
-
-    def get_token_list(self) -> List[str]:
-        result = []
+    def tokens(self) -> Iterator[Token]:
         t = self.get_next_token()
         while t.type != TokenType.EOF:
-            result.append(t)
+            yield t
             t = self.get_next_token()
-
-        return result + [t]
+        yield t
+
+    def get_token_list(self) -> List[Token]:
+        return list(self.tokens())
+
+
+class TokenStream:
+    compact_size = 4096
+
+    def __init__(self, tokenizer: Tokenizer) -> None:
+        self.tokenizer = tokenizer
+        self.scanner = tokenizer.scanner
+        self.types = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.values = []
+        self.offset = 0  # Index of the first stored token
+        self.at_eof = False
+        self.last_index = -1
+        self.last_token: Optional[Token] = None
+        tokenizer.keep = 0
+
+    def fill(self, index: int) -> bool:
+        if index < self.offset:
+            raise IndexError(f"Token {index} has already been released")
+        if index - self.offset < len(self.types):
+            return True
+        while index - self.offset >= len(self.types):
+            if self.at_eof:
+                return False
+            type, value, start, end = next(self.scanner)
+            self.types.append(type)
+            self.values.append(value)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.at_eof = type == TokenType.EOF.value
+        return True
+
+    def __getitem__(self, index: int) -> Optional[Token]:
+        if index == self.last_index:  # The parser asks for the same token many times in a row
+            return self.last_token
+        if not self.fill(index):
+            return None
+        i = index - self.offset
+        self.last_index = index
+        self.last_token = Token(token_types[self.types[i]], self.values[i], self.starts[i], self.ends[i])
+        return self.last_token
+
+    def type_at(self, index: int) -> int:
+        i = index - self.offset
+        if 0 <= i < len(self.types):
+            return self.types[i]
+        return self.types[index - self.offset] if self.fill(index) else -1
+
+    def value_at(self, index: int) -> Optional[TokenValue]:
+        i = index - self.offset
+        if 0 <= i < len(self.values):
+            return self.values[i]
+        return self.values[index - self.offset] if self.fill(index) else None
+
+    def release(self, index: int) -> None:  # Tokens before index may be forgotten
+        count = index - self.offset
+        if count >= TokenStream.compact_size:
+            del self.types[:count]
+            del self.values[:count]
+            del self.starts[:count]
+            del self.ends[:count]
+            self.offset = index
+            self.tokenizer.keep = self.starts[0]
@@ -0,0 +1,328 @@
+import marshal
+from AST.base import IComputable, Object, Constant, Variable, Assignment, MemberAccess, MemberCall
+from AST.base import FunctionCall, OperatorCall, ParentCall, FunctionCreate, create_none
+from AST.base import call_function, call_member, call_operator, get_member, plain_call, Scope, GLOBAL_DEPTH
+from AST.base import Completion, RETURN, BREAK, CONTINUE, MemberCache
+from AST.statements import IStatement, StatementList, ExprStatement, ReturnStatement
+from AST.logic import AndOperation, OrOperation, NotOperation, create_bool, try_bool
+from AST.flow_control import ConditionalStatement, ConditionalExpression, WhileStatement, ForStatement
+from AST.flow_control import BreakStatement, ContinueStatement
+from AST.flow_control import ContainsOperation
+from AST.collection_types import ItemAccess
+from AST.visitor import NodeTransformer
+from parser import DeferredBlock
+from typing import Any, Callable, List, Optional, TextIO, Type
+
+
+dump_file: Optional[TextIO] = None  # Generated source is written here as each block first runs
+
+
+def unresolved(name: str) -> None:
+    raise IndexError(f"Name {name} could not be resolved")
+
+
+def load_slot(scope: Scope, depth: int, index: int, name: str) -> Type[Object]:
+    result = scope.load(depth, index, name)
+    if result is None:
+        unresolved(name)
+    return result
+
+
+def lookup(scope: Scope, name: str) -> Type[Object]:
+    result = scope.lookup(name)
+    if result is None:
+        unresolved(name)
+    return result
+
+
+def store_attr(value: Type[Object], obj: Type[Object], name: str) -> Type[Object]:
+    obj.set(name, value)
+    return value
+
+
+def store_target(value: Type[Object], target: Any, scope: Scope) -> Type[Object]:
+    target.set_value(scope, value)
+    return value
+
+
+runtime = {
+    "_globals":         Variable.table.elements,
+    "create_none":      create_none,
+    "call_function":    call_function,
+    "call_member":      call_member,
+    "call_operator":    call_operator,
+    "get_member":       get_member,
+    "try_bool":         try_bool,
+    "create_bool":      create_bool,
+    "Completion":       Completion,
+    "RETURN":           RETURN,
+    "BREAK":            BREAK,
+    "CONTINUE":         CONTINUE,
+    "unresolved":       unresolved,
+    "load_slot":        load_slot,
+    "lookup":           lookup,
+    "store_attr":       store_attr,
+    "store_target":     store_target
+}
+
+
+MAX_NESTING = 50  # Python's parser allows 200 nested brackets, an expression level opens up to 3
+
+
+class Generator:  # Writes one fcad block as a Python function taking its Scope
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self.constants: List[Any] = []
+        self.indent = 1
+        self.loop_depth = 0
+        self.temp_n = 0
+        self.nesting = 0
+
+    def generate(self, node: Type[IComputable]) -> str:
+        self.unit(node)
+        return "def block(scope):\n    slots = scope.slots\n" + '\n'.join(self.lines) + '\n'
+
+    def line(self, text: str) -> None:
+        self.lines.append("    " * self.indent + text)
+
+    def constant(self, value: Any) -> str:
+        self.constants.append(value)
+        return f"_k[{len(self.constants) - 1}]"
+
+    def temp(self) -> str:
+        self.temp_n += 1
+        return f"_t{self.temp_n}"
+
+    def block(self, generate: Callable, *args) -> None:
+        start = len(self.lines)
+        self.indent += 1
+        generate(*args)
+        if len(self.lines) == start:
+            self.line("pass")
+        self.indent -= 1
+
+    def loop_block(self, body: Type[IStatement]) -> None:
+        self.loop_depth += 1
+        self.block(self.statement, body)
+        self.loop_depth -= 1
+
+    def unit(self, node: Type[IComputable]) -> None:  # Returns the value the node evaluates to
+        t = type(node)
+        if t is StatementList:
+            for statement in node.statements:
+                self.statement(statement)
+            self.line("return create_none()")
+        elif t is ExprStatement:
+            self.line(f"return {self.expr(node.expression)}")
+        elif t is ReturnStatement:
+            self.statement(node)
+        elif t is ConditionalStatement:
+            self.line(f"if try_bool({self.expr(node.condition)}).value:")
+            self.block(self.unit, node.if_body)
+            self.line("else:")
+            if node.else_body is not None:
+                self.block(self.unit, node.else_body)
+            else:
+                self.block(self.line, "return create_none()")
+        elif t is WhileStatement or t is ForStatement:
+            self.statement(node)
+            self.line("return create_none()")
+        else:
+            self.line(f"return {self.constant(node)}.eval(scope)")
+
+    def statement(self, node: Type[IStatement]) -> None:
+        t = type(node)
+        if t is ExprStatement:
+            if type(node.expression) is Assignment:
+                self.assignment(node.expression)
+            elif node.expression is not None:
+                self.line(self.expr(node.expression))
+        elif t is StatementList:
+            for statement in node.statements:
+                self.statement(statement)
+        elif t is ReturnStatement:
+            value = node.value.expression if type(node.value) is ExprStatement else node.value
+            self.line(f"scope.return_value = {self.expr(value)}")
+            self.line("return RETURN")
+        elif t is ConditionalStatement:
+            self.line(f"if try_bool({self.expr(node.condition)}).value:")
+            self.block(self.statement, node.if_body)
+            if node.else_body is not None:
+                self.line("else:")
+                self.block(self.statement, node.else_body)
+        elif t is WhileStatement:
+            self.line(f"while try_bool({self.expr(node.condition)}).value:")
+            self.loop_block(node.body)
+        elif t is ForStatement and isinstance(node.head, ContainsOperation):
+            value = self.temp()
+            self.line(f"for {value} in {self.expr(node.head.iterable)}:")
+            self.indent += 1
+            if type(node.head.value) is Variable:
+                self.store(node.head.value, value)
+            else:  # Destructuring stops the loop with StopIteration
+                self.line("try:")
+                self.block(self.line, f"{self.constant(node.head.value)}.set_value(scope, {value})")
+                self.line("except StopIteration:")
+                self.block(self.line, "break")
+            self.loop_depth += 1
+            self.statement(node.body)
+            self.loop_depth -= 1
+            self.indent -= 1
+        elif t is BreakStatement and self.loop_depth > 0:
+            self.line("break")
+        elif t is ContinueStatement and self.loop_depth > 0:
+            self.line("continue")
+        else:
+            result = self.temp()
+            self.line(f"{result} = {self.constant(node)}.eval(scope)")
+            self.line(f"if type({result}) is Completion:")
+            self.indent += 1
+            if self.loop_depth > 0:
+                self.line(f"if {result} is BREAK:")
+                self.block(self.line, "break")
+                self.line(f"if {result} is CONTINUE:")
+                self.block(self.line, "continue")
+            self.line(f"return {result}")
+            self.indent -= 1
+
+    def assignment(self, node: Assignment) -> None:
+        target = node.object
+        if type(target) is Variable:
+            self.store(target, self.expr(node.value))
+        elif type(target) is MemberAccess:  # The value is evaluated before the object
+            value = self.temp()
+            self.line(f"{value} = {self.expr(node.value)}")
+            self.line(f"{self.expr(target.object)}.set({target.name!r}, {value})")
+        else:
+            self.line(self.expr(node))
+
+    def expr(self, node: Optional[Type[IComputable]]) -> str:
+        if node is not None and self.nesting == MAX_NESTING:  # Deeper code runs on the tree
+            return f"{self.constant(node)}.eval(scope)"
+        self.nesting += 1
+        value = self.expression(node)
+        self.nesting -= 1
+        return value
+
+    def expression(self, node: Optional[Type[IComputable]]) -> str:
+        t = type(node)
+        if node is None:
+            return "create_none()"
+        elif t is Constant:
+            return self.constant(node.value)
+        elif t is Variable:
+            return self.load(node)
+        elif t is OperatorCall:
+            return f"call_operator({node.name!r}, [{self.args(node.arguments)}])"
+        elif t is Assignment:
+            value = self.expr(node.value)
+            if type(node.object) is MemberAccess:
+                return f"store_attr({value}, {self.expr(node.object.object)}, {node.object.name!r})"
+            return f"store_target({value}, {self.constant(node.object)}, scope)"
+        elif t is MemberAccess:
+            return f"{self.constant(node.cache)}.lookup({self.expr(node.object)}, {node.name!r})"
+        elif t is MemberCall and plain_call(node):
+            return self.member_call(self.expr(node.object), node.name, node.args, node.cache)
+        elif t is ParentCall and plain_call(node):
+            return self.member_call(self.load(node.this), node.name, node.args, node.cache, use_parent=True)
+        elif t is ItemAccess and not node.spread:
+            return self.member_call(self.expr(node.iterable), "#get_item", node.arguments, node.get_cache)
+        elif t is FunctionCall and plain_call(node):
+            return f"call_function({self.expr(node.function)}, [{self.args(node.args)}], None)"
+        elif t is AndOperation:
+            left = self.temp()
+            return f"({left} if not try_bool({left} := {self.expr(node.left)}).value else {self.expr(node.right)})"
+        elif t is OrOperation:
+            left = self.temp()
+            return f"({left} if try_bool({left} := {self.expr(node.left)}).value else {self.expr(node.right)})"
+        elif t is NotOperation:
+            return f"create_bool(not try_bool({self.expr(node.value)}).value)"
+        elif t is ConditionalExpression:
+            if node.if_expr is None:
+                condition = self.temp()
+                return (f"({condition} if try_bool({condition} := {self.expr(node.condition)}).value "
+                        f"else {self.expr(node.else_expr)})")
+            return (f"({self.expr(node.if_expr)} if try_bool({self.expr(node.condition)}).value "
+                    f"else {self.expr(node.else_expr)})")
+        return f"{self.constant(node)}.eval(scope)"
+
+    def load(self, node: Variable) -> str:
+        if node.depth is None:
+            return f"lookup(scope, {node.name!r})"
+        value = self.temp()
+        if node.depth == GLOBAL_DEPTH:
+            return f"({value} if ({value} := _globals.get({node.name!r})) is not None else unresolved({node.name!r}))"
+        if node.depth == 0 and node.is_cell:
+            return (f"({value} if ({value} := slots[{node.index}].value) is not None "
+                    f"else load_slot(scope, 0, {node.index}, {node.name!r}))")
+        if node.depth == 0:
+            return (f"({value} if ({value} := slots[{node.index}]) is not None "
+                    f"else load_slot(scope, 0, {node.index}, {node.name!r}))")
+        return f"load_slot(scope, {node.depth}, {node.index}, {node.name!r})"
+
+    def store(self, node: Variable, value: str) -> None:
+        if node.depth is None:
+            self.line(f"scope.assign({node.name!r}, {value})")
+        elif node.depth == GLOBAL_DEPTH:
+            self.line(f"_globals[{node.name!r}] = {value}")
+        elif node.depth == 0 and node.is_cell:
+            self.line(f"slots[{node.index}].value = {value}")
+        elif node.depth == 0:
+            self.line(f"slots[{node.index}] = {value}")
+        else:
+            self.line(f"{self.constant(node)}.set_value(scope, {value})")
+
+    def args(self, args: List[Type[IComputable]]) -> str:
+        return ", ".join(self.expr(arg) for arg in args)
+
+    def member_call(self, obj: str, name: str, args: List[Type[IComputable]], cache: MemberCache, *,
+                    use_parent=False) -> str:
+        this = self.temp()
+        cache = self.constant(cache)
+        member = (f"get_member({this}, {name!r}, use_parent=True, cache={cache})" if use_parent
+                  else f"get_member({this}, {name!r}, cache={cache})")
+        return f"call_member(({this} := {obj}), {member}, [{self.args(args)}], None)"
+
+
+class TranspiledBlock(IStatement):
+    def __init__(self, node: Type[IComputable]) -> None:
+        generator = Generator()
+        self.source = generator.generate(node)
+        self.constants = generator.constants
+        self.code = compile(self.source, "<fcad>", "exec")
+        self.function: Optional[Callable[[Scope], Type[Object]]] = None
+
+    def eval(self, scope: Scope) -> Type[Object]:
+        if self.function is None:
+            namespace = dict(runtime, _k=self.constants)
+            exec(self.code, namespace)
+            self.function = namespace["block"]
+            if dump_file is not None:
+                dump_file.write(self.source + '\n')
+        return self.function(scope)
+
+    def __getstate__(self) -> dict:  # Code objects go through marshal, so the AST cache keeps them
+        return {"source": self.source, "constants": self.constants, "code": marshal.dumps(self.code)}
+
+    def __setstate__(self, state: dict) -> None:
+        self.source = state["source"]
+        self.constants = state["constants"]
+        self.code = marshal.loads(state["code"])
+        self.function = None
+
+
+class Transpiler(NodeTransformer):
+    def __call__(self, node: Type[IComputable]) -> TranspiledBlock:
+        return TranspiledBlock(self.visit(node))
+
+    def __repr__(self) -> str:
+        return "Transpiler()"
+
+    def visit_FunctionCreate(self, node: FunctionCreate) -> FunctionCreate:
+        self.generic_visit(node)
+        if type(node.operation) is not DeferredBlock:  # Deferred bodies get transpiled once parsed
+            node.operation = TranspiledBlock(node.operation)
+        return node
+
+    def visit_DeferredBlock(self, node: DeferredBlock) -> DeferredBlock:
+        return node
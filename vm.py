@@ -0,0 +1,421 @@
+from AST.base import IComputable, Object, Constant, Variable, Assignment, MemberAccess, MemberCall
+from AST.base import FunctionCall, OperatorCall, ParentCall, FunctionCreate, create_none
+from AST.base import call_function, call_member, call_operator, get_member, plain_call, Scope, GLOBAL_DEPTH
+from AST.base import Completion, RETURN
+from AST.statements import IStatement, StatementList, ExprStatement, ReturnStatement
+from AST.logic import AndOperation, OrOperation, NotOperation, create_bool, try_bool
+from AST.flow_control import ConditionalStatement, ConditionalExpression, WhileStatement, ForStatement
+from AST.flow_control import BreakStatement, ContinueStatement
+from AST.flow_control import ContainsOperation
+from AST.collection_types import ItemAccess
+from AST.visitor import NodeTransformer
+from parser import DeferredBlock
+from typing import List, Optional, Tuple, Type, Any
+
+
+LOAD_CONST = 0
+LOAD_NAME = 1
+STORE_NAME = 2
+LOAD_ATTR = 3
+STORE_ATTR = 4
+STORE_TARGET = 5
+LOAD_METHOD = 6
+LOAD_PARENT_METHOD = 7
+CALL_METHOD = 8
+CALL_FUNCTION = 9
+CALL_OPERATOR = 10
+POP = 11
+DUP = 12
+NOT = 13
+JUMP = 14
+POP_JUMP_IF_FALSE = 15
+JUMP_IF_FALSE_OR_POP = 16
+JUMP_IF_TRUE_OR_POP = 17
+GET_ITER = 18
+FOR_ITER = 19
+FOR_STORE = 20
+RETURN_VALUE = 21
+RETURN_RESULT = 22
+EVAL = 23
+EXEC = 24
+LOAD_FAST = 25
+STORE_FAST = 26
+LOAD_DEREF = 27
+LOAD_GLOBAL = 28
+STORE_GLOBAL = 29
+LOAD_CELL = 30
+STORE_CELL = 31
+
+opcode_names = {value: name for name, value in list(globals().items()) if name.isupper()}
+
+Instruction = Tuple[int, Any]
+
+
+class Code:
+    def __init__(self, instructions: List[Instruction]) -> None:
+        self.instructions = instructions
+
+    def __repr__(self) -> str:
+        return '\n'.join(f"{pc:4} {opcode_names[op]:<22}{'' if arg is None else repr(arg)}"
+                         for pc, (op, arg) in enumerate(self.instructions))
+
+
+class Loop:
+    def __init__(self, continue_target: int) -> None:
+        self.continue_target = continue_target
+        self.breaks: List[int] = []
+
+
+class Compiler:
+    def __init__(self) -> None:
+        self.instructions: List[List] = []
+        self.loops: List[Loop] = []
+
+    def emit(self, op: int, arg: Any = None) -> int:
+        self.instructions.append([op, arg])
+        return len(self.instructions) - 1
+
+    def here(self) -> int:
+        return len(self.instructions)
+
+    def patch(self, index: int, target: Optional[int] = None) -> None:
+        self.instructions[index][1] = self.here() if target is None else target
+
+    def compile(self, node: Type[IComputable]) -> Code:
+        self.unit(node)
+        return Code([(op, arg) for op, arg in self.instructions])
+
+    def unit(self, node: Type[IComputable]) -> None:  # Leaves the value the node evaluates to
+        if type(node) is StatementList:
+            for statement in node.statements:
+                self.statement(statement)
+            self.emit(LOAD_CONST, None)
+            self.emit(RETURN_RESULT)
+        elif type(node) is ExprStatement:
+            self.expr(node.expression)
+            self.emit(RETURN_RESULT)
+        elif type(node) is ReturnStatement:
+            self.statement(node)
+        elif type(node) is ConditionalStatement:
+            self.expr(node.condition)
+            jump = self.emit(POP_JUMP_IF_FALSE)
+            self.unit(node.if_body)
+            self.patch(jump)
+            if node.else_body is not None:
+                self.unit(node.else_body)
+            else:
+                self.emit(LOAD_CONST, None)
+                self.emit(RETURN_RESULT)
+        elif type(node) in (WhileStatement, ForStatement):
+            self.statement(node)
+            self.emit(LOAD_CONST, None)
+            self.emit(RETURN_RESULT)
+        else:
+            self.emit(EVAL, node)
+            self.emit(RETURN_RESULT)
+
+    def statement(self, node: Type[IStatement]) -> None:
+        t = type(node)
+        if t is ExprStatement:
+            if node.expression is not None:
+                self.expr(node.expression)
+                self.emit(POP)
+        elif t is StatementList:
+            for statement in node.statements:
+                self.statement(statement)
+        elif t is ReturnStatement:
+            self.expr(node.value.expression if type(node.value) is ExprStatement else node.value)
+            self.emit(RETURN_VALUE)
+        elif t is ConditionalStatement:
+            self.expr(node.condition)
+            jump = self.emit(POP_JUMP_IF_FALSE)
+            self.statement(node.if_body)
+            if node.else_body is not None:
+                end_jump = self.emit(JUMP)
+                self.patch(jump)
+                self.statement(node.else_body)
+                self.patch(end_jump)
+            else:
+                self.patch(jump)
+        elif t is WhileStatement:
+            start = self.here()
+            self.expr(node.condition)
+            exit_jump = self.emit(POP_JUMP_IF_FALSE)
+            self.loop_body(node.body, Loop(start))
+            self.emit(JUMP, start)
+            self.patch(exit_jump)
+            for jump in self.loops.pop().breaks:
+                self.patch(jump)
+        elif t is ForStatement and isinstance(node.head, ContainsOperation):
+            self.expr(node.head.iterable)
+            self.emit(GET_ITER)
+            start = self.emit(FOR_ITER)
+            store = self.emit(FOR_STORE)
+            self.loop_body(node.body, Loop(start))
+            self.emit(JUMP, start)
+            cleanup = self.emit(POP)
+            self.instructions[store][1] = (node.head.value, cleanup)
+            for jump in self.loops.pop().breaks:
+                self.patch(jump, cleanup)
+            self.patch(start)
+        elif t is BreakStatement and self.loops:
+            self.loops[-1].breaks.append(self.emit(JUMP))
+        elif t is ContinueStatement and self.loops:
+            self.emit(JUMP, self.loops[-1].continue_target)
+        else:
+            self.emit(EXEC, node)
+
+    def loop_body(self, body: Type[IStatement], loop: Loop) -> None:
+        self.loops.append(loop)
+        self.statement(body)
+
+    def expr(self, node: Optional[Type[IComputable]]) -> None:
+        t = type(node)
+        if node is None:
+            self.emit(LOAD_CONST, None)
+        elif t is Constant:
+            self.emit(LOAD_CONST, node.value)
+        elif t is Variable:
+            self.load(node)
+        elif t is OperatorCall:
+            for arg in node.arguments:
+                self.expr(arg)
+            self.emit(CALL_OPERATOR, (node.name, len(node.arguments)))
+        elif t is Assignment:
+            self.expr(node.value)
+            self.emit(DUP)
+            self.store(node.object)
+        elif t is MemberAccess:
+            self.expr(node.object)
+            self.emit(LOAD_ATTR, (node.name, node.cache))
+        elif t is MemberCall and plain_call(node):
+            self.expr(node.object)
+            self.emit(LOAD_METHOD, (node.name, node.cache))
+            self.call_args(node.args)
+            self.emit(CALL_METHOD, len(node.args))
+        elif t is ParentCall and plain_call(node):
+            self.load(node.this)
+            self.emit(LOAD_PARENT_METHOD, (node.name, node.cache))
+            self.call_args(node.args)
+            self.emit(CALL_METHOD, len(node.args))
+        elif t is ItemAccess and not node.spread:
+            self.expr(node.iterable)
+            self.emit(LOAD_METHOD, ("#get_item", node.get_cache))
+            self.call_args(node.arguments)
+            self.emit(CALL_METHOD, len(node.arguments))
+        elif t is FunctionCall and plain_call(node):
+            self.expr(node.function)
+            self.call_args(node.args)
+            self.emit(CALL_FUNCTION, len(node.args))
+        elif t is AndOperation:
+            self.expr(node.left)
+            jump = self.emit(JUMP_IF_FALSE_OR_POP)
+            self.expr(node.right)
+            self.patch(jump)
+        elif t is OrOperation:
+            self.expr(node.left)
+            jump = self.emit(JUMP_IF_TRUE_OR_POP)
+            self.expr(node.right)
+            self.patch(jump)
+        elif t is NotOperation:
+            self.expr(node.value)
+            self.emit(NOT)
+        elif t is ConditionalExpression:
+            self.expr(node.condition)
+            if node.if_expr is None:
+                jump = self.emit(JUMP_IF_TRUE_OR_POP)
+                self.expr(node.else_expr)
+                self.patch(jump)
+            else:
+                else_jump = self.emit(POP_JUMP_IF_FALSE)
+                self.expr(node.if_expr)
+                end_jump = self.emit(JUMP)
+                self.patch(else_jump)
+                self.expr(node.else_expr)
+                self.patch(end_jump)
+        else:
+            self.emit(EVAL, node)
+
+    def call_args(self, args: List[Type[IComputable]]) -> None:
+        for arg in args:
+            self.expr(arg)
+
+    def load(self, node: Variable) -> None:
+        if node.depth is None:
+            self.emit(LOAD_NAME, node.name)
+        elif node.depth == GLOBAL_DEPTH:
+            self.emit(LOAD_GLOBAL, node.name)
+        elif node.depth == 0 and node.is_cell:
+            self.emit(LOAD_CELL, (node.index, node.name))
+        elif node.depth == 0:
+            self.emit(LOAD_FAST, (node.index, node.name))
+        else:
+            self.emit(LOAD_DEREF, (node.depth, node.index, node.name))
+
+    def store(self, target) -> None:  # Consumes the value on top of the stack
+        if type(target) is Variable and target.depth is None:
+            self.emit(STORE_NAME, target.name)
+        elif type(target) is Variable and target.depth == GLOBAL_DEPTH:
+            self.emit(STORE_GLOBAL, target.name)
+        elif type(target) is Variable and target.depth == 0 and target.is_cell:
+            self.emit(STORE_CELL, target.index)
+        elif type(target) is Variable and target.depth == 0:
+            self.emit(STORE_FAST, target.index)
+        elif type(target) is MemberAccess:
+            self.expr(target.object)
+            self.emit(STORE_ATTR, target.name)
+        else:
+            self.emit(STORE_TARGET, target)
+
+
+def run(code: Code, scope: Scope) -> Type[Object]:
+    instructions = code.instructions
+    slots = scope.slots
+    global_elements = Variable.table.elements
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    while True:
+        op, arg = instructions[pc]
+        pc += 1
+        if op == LOAD_FAST:
+            value = slots[arg[0]]
+            if value is None:
+                value = scope.load(0, *arg)
+                if value is None:
+                    raise IndexError(f"Name {arg[1]} could not be resolved")
+            push(value)
+        elif op == LOAD_CONST:
+            push(arg if arg is not None else create_none())
+        elif op == CALL_OPERATOR:
+            name, count = arg
+            args = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            push(call_operator(name, args))
+        elif op == STORE_FAST:
+            slots[arg] = pop()
+        elif op == LOAD_GLOBAL:
+            value = global_elements.get(arg)
+            if value is None:
+                raise IndexError(f"Name {arg} could not be resolved")
+            push(value)
+        elif op == STORE_GLOBAL:
+            global_elements[arg] = pop()
+        elif op == LOAD_CELL:
+            value = slots[arg[0]].value
+            if value is None:
+                value = scope.load(0, *arg)
+                if value is None:
+                    raise IndexError(f"Name {arg[1]} could not be resolved")
+            push(value)
+        elif op == STORE_CELL:
+            slots[arg].value = pop()
+        elif op == LOAD_DEREF:
+            value = scope.load(*arg)
+            if value is None:
+                raise IndexError(f"Name {arg[2]} could not be resolved")
+            push(value)
+        elif op == LOAD_NAME:
+            value = scope.lookup(arg)
+            if value is None:
+                raise IndexError(f"Name {arg} could not be resolved")
+            push(value)
+        elif op == STORE_NAME:
+            scope.assign(arg, pop())
+        elif op == POP:
+            pop()
+        elif op == DUP:
+            push(stack[-1])
+        elif op == POP_JUMP_IF_FALSE:
+            if not try_bool(pop()).value:
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == LOAD_ATTR:
+            push(arg[1].lookup(pop(), arg[0]))
+        elif op == STORE_ATTR:
+            obj = pop()
+            obj.set(arg, pop())
+        elif op == LOAD_METHOD:
+            push(get_member(stack[-1], arg[0], cache=arg[1]))
+        elif op == LOAD_PARENT_METHOD:
+            push(get_member(stack[-1], arg[0], use_parent=True, cache=arg[1]))
+        elif op == CALL_METHOD:
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            f = pop()
+            push(call_member(pop(), f, args, None))
+        elif op == CALL_FUNCTION:
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            push(call_function(pop(), args, None))
+        elif op == JUMP_IF_FALSE_OR_POP:
+            if not try_bool(stack[-1]).value:
+                pc = arg
+            else:
+                pop()
+        elif op == JUMP_IF_TRUE_OR_POP:
+            if try_bool(stack[-1]).value:
+                pc = arg
+            else:
+                pop()
+        elif op == NOT:
+            push(create_bool(not try_bool(pop()).value))
+        elif op == GET_ITER:
+            push(iter(pop()))
+        elif op == FOR_ITER:
+            try:
+                push(next(stack[-1]))
+            except StopIteration:
+                pop()
+                pc = arg
+        elif op == FOR_STORE:
+            target, cleanup = arg
+            try:
+                target.set_value(scope, pop())
+            except StopIteration:
+                pc = cleanup
+        elif op == STORE_TARGET:
+            arg.set_value(scope, pop())
+        elif op == EVAL:
+            push(arg.eval(scope))
+        elif op == EXEC:
+            result = arg.eval(scope)
+            if type(result) is Completion:
+                return result
+        elif op == RETURN_VALUE:
+            scope.return_value = pop()
+            return RETURN
+        elif op == RETURN_RESULT:
+            return pop()
+        else:
+            raise SystemError(f"Unknown opcode {op}")
+
+
+class CompiledBlock(IStatement):
+    def __init__(self, node: Type[IComputable]) -> None:
+        self.node = node
+        self.code: Optional[Code] = None
+
+    def eval(self, scope: Scope) -> Type[Object]:
+        if self.code is None:  # Compiled on the first run, so unused functions cost nothing
+            self.code = Compiler().compile(self.node)
+        return run(self.code, scope)
+
+
+class VMCompiler(NodeTransformer):
+    def __call__(self, node: Type[IComputable]) -> CompiledBlock:
+        return CompiledBlock(self.visit(node))
+
+    def __repr__(self) -> str:
+        return "VMCompiler()"
+
+    def visit_FunctionCreate(self, node: FunctionCreate) -> FunctionCreate:
+        self.generic_visit(node)
+        if type(node.operation) is not DeferredBlock:  # Deferred bodies get compiled once parsed
+            node.operation = CompiledBlock(node.operation)
+        return node
+
+    def visit_DeferredBlock(self, node: DeferredBlock) -> DeferredBlock:
+        return node